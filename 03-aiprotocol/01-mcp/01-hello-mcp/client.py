@@ -1,19 +1,149 @@
-import requests
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import httpx
+
+# The load loop and its percentiles are shared with the benchmarks.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "shared"))
+from latency import measure  # noqa: E402
+
 url = "http://localhost:8000/mcp/"
 headers = {
     "Accept": "application/json,text/event-stream",
     }
-body = {
-    "jsonrpc": "2.0",
-    "method":"tools/list",
-    "id":1,
-    "params":{},	
-}
-response = requests.post(url,headers=headers,json=body)
 
-for line in response.iter_lines():
-    if line:
-        print(line)
 
+class RpcError(Exception):
+    def __init__(self, error: dict):
+        super().__init__(f"{error.get('code')}: {error.get('message')}")
+        self.error = error
+
+
+async def sse_events(response: httpx.Response) -> AsyncIterator[str]:
+    """Yields the data of each server-sent event as soon as its blank line arrives."""
+    data: list[str] = []
+    async for line in response.aiter_lines():
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].removeprefix(" "))
+        # "event:", "id:", "retry:" and ":" comment lines carry nothing we need.
+    if data:
+        yield "\n".join(data)
+
+
+class StreamingClient:
+    """A JSON-RPC client for a streamable HTTP MCP server.
+
+    Requests share one pool of keep-alive connections and may be sent
+    concurrently; each is a POST whose reply, plain JSON or an SSE stream,
+    is parsed as it arrives. Messages are matched to their request by id,
+    and notifications the server sends along the way go to `notifications`.
+    """
+
+    def __init__(self, url: str = url, max_connections: int = 100, timeout: float = 30.0):
+        self.url = url
+        self.client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections
+            ),
+        )
+        self.session_id: str | None = None
+        self.notifications: deque[dict] = deque(maxlen=1000)
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future] = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.client.aclose()
+
+    async def initialize(self) -> dict:
+        result = await self.request("initialize", {
+            "protocolVersion": "2025-03-26",
+            "capabilities": {},
+            "clientInfo": {"name": "hello-mcp-client", "version": "0.1.0"},
+        })
+        await self.notify("notifications/initialized")
+        return result
+
+    async def notify(self, method: str, params: dict | None = None):
+        await self._post({"jsonrpc": "2.0", "method": method, "params": params or {}})
+
+    async def request(self, method: str, params: dict | None = None) -> Any:
+        request_id = next(self._ids)
+        response = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = response
+        try:
+            await self._post({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params or {}})
+            if not response.done():
+                raise RpcError({"code": -32000, "message": f"No response to request {request_id}"})
+            return await response
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _post(self, body: dict):
+        request_headers = {"Mcp-Session-Id": self.session_id} if self.session_id else {}
+        async with self.client.stream("POST", self.url, json=body, headers=request_headers) as response:
+            response.raise_for_status()
+            if "mcp-session-id" in response.headers:
+                self.session_id = response.headers["mcp-session-id"]
+            if response.status_code == 202:
+                return
+            if response.headers.get("content-type", "").startswith("text/event-stream"):
+                async for data in sse_events(response):
+                    self._dispatch(json.loads(data))
+            else:
+                message = json.loads(await response.aread())
+                for item in message if isinstance(message, list) else [message]:
+                    self._dispatch(item)
+
+    def _dispatch(self, message: dict):
+        if "id" not in message or "method" in message:
+            self.notifications.append(message)
+            return
+        response = self._pending.get(message["id"])
+        if response is None or response.done():
+            return
+        if "error" in message:
+            response.set_exception(RpcError(message["error"]))
+        else:
+            response.set_result(message.get("result"))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Call, or load test, a streamable HTTP MCP server.")
+    parser.add_argument("--url", default=url)
+    parser.add_argument("--method", default="tools/list")
+    parser.add_argument("--tool", help="Tool to call; implies --method tools/call")
+    parser.add_argument("--args", default="{}", help="Tool arguments as JSON")
+    parser.add_argument("--load", type=int, metavar="N", help="Send N requests and report latency")
+    parser.add_argument("--concurrency", type=int, default=20)
+    options = parser.parse_args()
+
+    method, params = options.method, {}
+    if options.tool:
+        method, params = "tools/call", {"name": options.tool, "arguments": json.loads(options.args)}
+
+    async with StreamingClient(options.url, max_connections=options.concurrency) as client:
+        await client.initialize()
+        if options.load:
+            report = await measure(lambda: client.request(method, params), options.load, options.concurrency)
+        else:
+            report = await client.request(method, params)
+        print(json.dumps(report, indent=2))
 
 
+if __name__ == "__main__":
+    asyncio.run(main())
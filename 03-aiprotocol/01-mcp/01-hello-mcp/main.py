@@ -1,17 +1,32 @@
+import sys
 from mcp.server.fastmcp import FastMCP
 from datetime import datetime
+from pathlib import Path
+
+# tool_execution is shared by the MCP servers in this chapter.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "shared"))
+from tool_execution import ExecutionPolicy, ToolExecutor
 
 mcp = FastMCP(name = "hello-mcp",stateless_http = True)
 
+# Tools that block (network calls, parsing) run in a thread pool so they
+# don't stall the other requests; quick ones run inline.
+executor = ToolExecutor(mcp)
+
 mcp_app = mcp.streamable_http_app()
 # create weather tool
-@mcp.tool()
+@executor.tool(ExecutionPolicy("thread", max_concurrency=8, timeout=10))
 def get_weather(city: str) -> str:
     return f"The weather in {city} is sunny."
 
 # create a tool to get the time
-@mcp.tool()
+@executor.tool()
 def get_time() -> str:
     return f"The time is {datetime.now().strftime('%H:%M:%S')}"
 
+# running and queued calls, and wait and run times, per tool
+@mcp.resource("metrics://tools", mime_type="application/json")
+def tool_metrics() -> dict:
+    return executor.stats()
+
 # create a tool to get the date
\ No newline at end of file
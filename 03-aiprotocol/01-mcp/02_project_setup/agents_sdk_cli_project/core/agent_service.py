@@ -1,37 +1,32 @@
 import asyncio
+from typing import AsyncIterator
 from openai import AsyncOpenAI
-from agents import Agent, OpenAIChatCompletionsModel, Runner, RunResult
-from agents.tool import FunctionTool
-from mcp.types import Tool
-from core.tools import ToolManager
+from agents import Agent, ModelSettings, OpenAIChatCompletionsModel, Runner, RunResult, StreamEvent
+from core.context_window import ContextWindow
+from core.tool_cache import ToolResultCache
+from core.tool_catalog import ToolCatalog
+from core.tool_registry import ToolRegistry
 from mcp_client import MCPClient
 
-async def convert_to_sdk_tool(tools_schema: list[Tool], mcp_clients: dict[str, MCPClient]) -> list[FunctionTool]:
-    converted_tools = []
-    for tool in tools_schema:
-            client = await ToolManager._find_client_with_tool(
-                list(mcp_clients.values()), tool.name
-            )
-            if client:
-                converted_tools.append(
-                    FunctionTool(
-                        name=tool.name,
-                        description=tool.description or "",
-                        params_json_schema=tool.inputSchema,
-                        on_invoke_tool=ToolManager.execute_tool_dynamically(tool.name, client)
-                    )
-                )
-            else:
-                raise ValueError(f"No client found for tool: {tool.name}")
-    
-    return converted_tools
-
 
 class AgentService:
-    def __init__(self, model: str, api_key: str, base_url: str | None = None, clients=None):
+    def __init__(
+        self,
+        model: str,
+        api_key: str,
+        base_url: str | None = None,
+        clients=None,
+        context_window: ContextWindow | None = None,
+    ):
         self.model = model
         self.api_key = api_key
         self.messages = []
+        self.context_window = context_window or ContextWindow()
+        self.tool_catalog = ToolCatalog(clients or {})
+        result_cache = ToolResultCache()
+        self.tool_registry = ToolRegistry(result_cache=result_cache)
+        # Cached tool results from a server are stale once it reports a change.
+        self.tool_catalog.add_change_listener(result_cache.invalidate_server)
 
         self.client = AsyncOpenAI(
             api_key=api_key,
@@ -45,29 +40,60 @@ class AgentService:
                 model=model,
                 openai_client=self.client
             ),
+            tools=self.tool_registry.tools,  # type: ignore
+            # Tool calls from one response run concurrently in the SDK.
+            model_settings=ModelSettings(parallel_tool_calls=True),
         )
 
     async def chat(
         self,
-        query: str,
+        query: str | None = None,
         system=None,
-        mcp_clients: dict[str, MCPClient] = {},
+        mcp_clients: dict[str, MCPClient] | None = None,
     ) -> RunResult:
-        if system:
-            self.agent.instructions = system
-
-        tools = await ToolManager.get_all_tools(mcp_clients)
-        
-        if tools:
-            self.agent.tools = await convert_to_sdk_tool(tools, mcp_clients) or []  # type: ignore
-
-        self.messages.append({"role": "user", "content": query})
+        await self._prepare_turn(query, system, mcp_clients)
         
         result = await Runner.run(
             self.agent,
             self.messages
         )
         
-        self.messages = result.to_input_list()
+        self.messages = self.context_window.compact(result.to_input_list())
 
         return result
+
+    async def chat_streamed(
+        self,
+        query: str | None = None,
+        system=None,
+        mcp_clients: dict[str, MCPClient] | None = None,
+    ) -> AsyncIterator[StreamEvent]:
+        """Runs a turn like `chat`, yielding the SDK stream events as they arrive."""
+        await self._prepare_turn(query, system, mcp_clients)
+
+        result = Runner.run_streamed(
+            self.agent,
+            self.messages
+        )
+        async for event in result.stream_events():
+            yield event
+
+        self.messages = self.context_window.compact(result.to_input_list())
+
+    async def _prepare_turn(
+        self,
+        query: str | None,
+        system,
+        mcp_clients: dict[str, MCPClient] | None,
+    ):
+        if system:
+            self.agent.instructions = system
+
+        # Without clients, the ones from earlier turns stay registered.
+        if mcp_clients is not None:
+            self.tool_catalog.set_clients(mcp_clients)
+        entries = await self.tool_catalog.get_entries()
+        self.tool_registry.sync(entries, self.tool_catalog.version)
+
+        if query is not None:
+            self.messages.append({"role": "user", "content": query})
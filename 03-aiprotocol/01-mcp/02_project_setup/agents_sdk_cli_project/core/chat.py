@@ -1,3 +1,7 @@
+from typing import AsyncIterator
+
+from agents import StreamEvent
+
 from core.agent_service import AgentService
 from mcp_client import MCPClient
 
@@ -11,10 +15,24 @@ class Chat:
         self,
         query: str,
     ) -> str:
+        await self._process_query(query)
 
         response = await self.agent_serve.chat(
-            query=query,
             mcp_clients=self.clients,
         )
         
         return response.final_output
+
+    async def run_streamed(
+        self,
+        query: str,
+    ) -> AsyncIterator[StreamEvent]:
+        await self._process_query(query)
+
+        async for event in self.agent_serve.chat_streamed(
+            mcp_clients=self.clients,
+        ):
+            yield event
+
+    async def _process_query(self, query: str):
+        self.agent_serve.messages.append({"role": "user", "content": query})
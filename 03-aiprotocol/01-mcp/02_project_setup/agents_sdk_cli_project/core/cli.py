@@ -1,4 +1,6 @@
-from typing import List, Optional
+import asyncio
+import time
+from typing import Iterable, List, Optional
 from prompt_toolkit import PromptSession
 from prompt_toolkit.completion import Completer, Completion
 from prompt_toolkit.key_binding import KeyBindings
@@ -7,8 +9,11 @@ from prompt_toolkit.history import InMemoryHistory
 from prompt_toolkit.auto_suggest import AutoSuggest, Suggestion
 from prompt_toolkit.document import Document
 from prompt_toolkit.buffer import Buffer
+from openai.types.responses import ResponseTextDeltaEvent
+from mcp import types
 
 from core.cli_chat import CliChat
+from core.completion_index import CompletionIndex
 
 
 class CommandAutoSuggest(AutoSuggest):
@@ -40,14 +45,24 @@ class UnifiedCompleter(Completer):
     def __init__(self):
         self.prompts = []
         self.prompt_dict = {}
-        self.resources = []
+        self.prompt_index = CompletionIndex()
+        self.resource_index = CompletionIndex()
 
     def update_prompts(self, prompts: List):
         self.prompts = prompts
         self.prompt_dict = {prompt.name: prompt for prompt in prompts}
-
-    def update_resources(self, resources: List):
-        self.resources = resources
+        self.prompt_index.update(self.prompt_dict)
+
+    def update_resources(self, resources: Iterable[str]):
+        if len(self.resource_index):
+            self.resource_index.update(resources)
+        else:
+            # Build the first index aside and swap it in, so completions
+            # don't wait on the index's lock for the whole initial build.
+            # Later updates apply just the difference under that lock.
+            index = CompletionIndex()
+            index.update(resources)
+            self.resource_index = index
 
     def get_completions(self, document, complete_event):
         text = document.text
@@ -57,14 +72,13 @@ class UnifiedCompleter(Completer):
             last_at_pos = text_before_cursor.rfind("@")
             prefix = text_before_cursor[last_at_pos + 1 :]
 
-            for resource_id in self.resources:
-                if resource_id.lower().startswith(prefix.lower()):
-                    yield Completion(
-                        resource_id,
-                        start_position=-len(prefix),
-                        display=resource_id,
-                        display_meta="Resource",
-                    )
+            for resource_id in self.resource_index.search(prefix):
+                yield Completion(
+                    resource_id,
+                    start_position=-len(prefix),
+                    display=resource_id,
+                    display_meta="Resource",
+                )
             return
 
         if text.startswith("/"):
@@ -73,21 +87,21 @@ class UnifiedCompleter(Completer):
             if len(parts) <= 1 and not text.endswith(" "):
                 cmd_prefix = parts[0] if parts else ""
 
-                for prompt in self.prompts:
-                    if prompt.name.startswith(cmd_prefix):
-                        yield Completion(
-                            prompt.name,
-                            start_position=-len(cmd_prefix),
-                            display=f"/{prompt.name}",
-                            display_meta=prompt.description or "",
-                        )
+                for name in self.prompt_index.search(cmd_prefix):
+                    prompt = self.prompt_dict[name]
+                    yield Completion(
+                        prompt.name,
+                        start_position=-len(cmd_prefix),
+                        display=f"/{prompt.name}",
+                        display_meta=prompt.description or "",
+                    )
                 return
 
             if len(parts) == 1 and text.endswith(" "):
                 cmd = parts[0]
 
                 if cmd in self.prompt_dict:
-                    for id in self.resources:
+                    for id in self.resource_index.search(""):
                         yield Completion(
                             id,
                             start_position=0,
@@ -98,22 +112,32 @@ class UnifiedCompleter(Completer):
             if len(parts) >= 2:
                 doc_prefix = parts[-1]
 
-                for resource in self.resources:
-                    if "id" in resource and resource["id"].lower().startswith(
-                        doc_prefix.lower()
-                    ):
-                        yield Completion(
-                            resource["id"],
-                            start_position=-len(doc_prefix),
-                            display=resource["id"],
-                        )
+                for resource_id in self.resource_index.search(doc_prefix):
+                    yield Completion(
+                        resource_id,
+                        start_position=-len(doc_prefix),
+                        display=resource_id,
+                    )
                 return
 
 
 class CliApp:
-    def __init__(self, agent: CliChat):
+    def __init__(
+        self,
+        agent: CliChat,
+        streaming: bool = False,
+        refresh_interval: float = 60.0,
+        refresh_debounce: float = 0.5,
+    ):
         self.agent = agent
-        self.resources = []
+        self.streaming = streaming
+        self.refresh_interval = refresh_interval
+        self.refresh_debounce = refresh_debounce
+        self._refresh_requested = asyncio.Event()
+        # Catalogs a list_changed notification has named since the last refresh.
+        self._changed_catalogs: set[str] = set()
+        self._refresh_task: asyncio.Task | None = None
+        self._resource_ids: set[str] = set()
         self.prompts = []
 
         self.completer = UnifiedCompleter()
@@ -175,21 +199,87 @@ class CliApp:
             complete_in_thread=True,
             auto_suggest=self.command_autosuggester,
         )
+        self.session.default_buffer.on_text_changed += self._prefetch_mentions
 
     async def initialize(self):
-        await self.refresh_resources()
-        await self.refresh_prompts()
+        """Starts loading resources and prompts without delaying the first prompt."""
+        self.agent.doc_client.add_notification_handler(self._handle_notification)
+        self._refresh_task = asyncio.create_task(self._keep_catalogs_fresh())
+
+    async def _keep_catalogs_fresh(self):
+        refreshers = {"resources": self.refresh_resources, "prompts": self.refresh_prompts}
+        await asyncio.gather(*(refresh() for refresh in refreshers.values()))
+        while True:
+            # A catalog is re-listed when the server says it changed. Only
+            # catalogs the server sends no list_changed for are polled.
+            polled = {name for name in refreshers if not self._announces_changes(name)}
+            try:
+                await asyncio.wait_for(
+                    self._refresh_requested.wait(),
+                    self.refresh_interval if polled else None,
+                )
+                # Coalesce bursts of change notifications into one refresh.
+                await asyncio.sleep(self.refresh_debounce)
+            except asyncio.TimeoutError:
+                self._changed_catalogs |= polled
+            self._refresh_requested.clear()
+            changed, self._changed_catalogs = self._changed_catalogs, set()
+            await asyncio.gather(*(refreshers[name]() for name in changed))
+
+    def _announces_changes(self, catalog: str) -> bool:
+        capabilities = self.agent.doc_client.server_capabilities
+        capability = getattr(capabilities, catalog, None)
+        return bool(capability and capability.listChanged)
+
+    async def _handle_notification(self, notification: types.ServerNotification):
+        if isinstance(notification.root, types.ResourceListChangedNotification):
+            self._changed_catalogs.add("resources")
+        elif isinstance(notification.root, types.PromptListChangedNotification):
+            self._changed_catalogs.add("prompts")
+        else:
+            return
+        self._refresh_requested.set()
+
+    def _prefetch_mentions(self, buffer: Buffer):
+        """Warms documents and prompts referenced by the line being typed."""
+        text = buffer.text
+        resource_ids = self._resource_ids
+
+        if text.startswith("/"):
+            parts = text[1:].split()
+            if (
+                len(parts) == 2
+                and parts[0] in self.completer.prompt_dict
+                and parts[1] in resource_ids
+            ):
+                self.agent.prefetch_prompt(parts[0], parts[1])
+            return
+
+        for word in text.split():
+            if word.startswith("@") and word[1:] in resource_ids:
+                self.agent.prefetch_doc(word[1:])
 
     async def refresh_resources(self):
         try:
-            self.resources = await self.agent.list_docs_ids()
-            self.completer.update_resources(self.resources)
+            # Completion needs every id, but only one copy: the listing is
+            # read a page at a time straight into a set.
+            resource_ids = {doc_id async for doc_id in self.agent.iter_docs_ids()}
+            if resource_ids == self._resource_ids:
+                return
+            if self._resource_ids:
+                self.completer.update_resources(resource_ids)
+            else:
+                await asyncio.to_thread(self.completer.update_resources, resource_ids)
+            self._resource_ids = resource_ids
         except Exception as e:
             print(f"Error refreshing resources: {e}")
 
     async def refresh_prompts(self):
         try:
-            self.prompts = await self.agent.list_prompts()
+            prompts = await self.agent.list_prompts()
+            if prompts == self.prompts:
+                return
+            self.prompts = prompts
             self.completer.update_prompts(self.prompts)
             self.command_autosuggester = CommandAutoSuggest(self.prompts)
             self.session.auto_suggest = self.command_autosuggester
@@ -197,14 +287,44 @@ class CliApp:
             print(f"Error refreshing prompts: {e}")
 
     async def run(self):
-        while True:
-            try:
-                user_input = await self.session.prompt_async("> ")
-                if not user_input.strip():
-                    continue
-
-                response = await self.agent.run(user_input)
-                print(f"\nResponse:\n{response}")
-
-            except KeyboardInterrupt:
-                break
+        try:
+            while True:
+                try:
+                    user_input = await self.session.prompt_async("> ")
+                    if not user_input.strip():
+                        continue
+
+                    if self.streaming:
+                        await self._print_streamed(user_input)
+                    else:
+                        response = await self.agent.run(user_input)
+                        print(f"\nResponse:\n{response}")
+
+                except KeyboardInterrupt:
+                    break
+        finally:
+            if self._refresh_task is not None:
+                self._refresh_task.cancel()
+
+    async def _print_streamed(self, user_input: str):
+        """Prints the response as it is generated, followed by its latency."""
+        started = time.perf_counter()
+        first_token_at = None
+
+        print("\nResponse:")
+        async for event in self.agent.run_streamed(user_input):
+            if event.type == "raw_response_event":
+                if isinstance(event.data, ResponseTextDeltaEvent) and event.data.delta:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    print(event.data.delta, end="", flush=True)
+            elif event.type == "run_item_stream_event":
+                if event.name == "tool_called":
+                    tool_name = getattr(event.item.raw_item, "name", "tool")
+                    print(f"\n[calling {tool_name}...]", flush=True)
+                elif event.name == "tool_output":
+                    print("[tool finished]", flush=True)
+
+        total = time.perf_counter() - started
+        ttft = f"{first_token_at - started:.2f}s" if first_token_at else "n/a"
+        print(f"\n\n(time to first token: {ttft}, total: {total:.2f}s)")
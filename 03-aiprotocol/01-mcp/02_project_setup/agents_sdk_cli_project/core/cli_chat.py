@@ -1,9 +1,18 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator
+from urllib.parse import quote
+
 from mcp.types import Prompt, PromptMessage
 
 from core.chat import Chat
 from core.agent_service import AgentService
+from core.resource_cache import ResourceCache
 from mcp_client import MCPClient
 
+logger = logging.getLogger(__name__)
+
 
 class CliChat(Chat):
     def __init__(
@@ -15,30 +24,68 @@ class CliChat(Chat):
         super().__init__(clients=clients, agent_serve=agent_serve)
 
         self.doc_client: MCPClient = doc_client
+        self.resource_cache = ResourceCache(doc_client)
+        self.max_prefetched_prompts = 8
+        self._prefetched_prompts: OrderedDict[tuple[str, str], asyncio.Task] = OrderedDict()
 
     async def list_prompts(self) -> list[Prompt]:
         return await self.doc_client.list_prompts()
 
-    async def list_docs_ids(self) -> list[str]:
-        return await self.doc_client.read_resource("docs://documents")
+    def iter_docs_ids(self, prefix: str = "") -> AsyncIterator[str]:
+        """Yields document ids one listing page at a time."""
+        uri = "docs://documents"
+        if prefix:
+            uri = f"docs://documents/prefix/{quote(prefix, safe='')}"
+        return self.doc_client.iter_resource(uri)
 
     async def get_doc_content(self, doc_id: str) -> str:
-        return await self.doc_client.read_resource(f"docs://documents/{doc_id}")
+        return await self.resource_cache.read(f"docs://documents/{quote(doc_id, safe='')}")
 
     async def get_prompt(
         self, command: str, doc_id: str
     ) -> list[PromptMessage]:
+        task = self._prefetched_prompts.pop((command, doc_id), None)
+        if task is not None:
+            try:
+                return await task
+            except Exception:
+                pass
         return await self.doc_client.get_prompt(command, {"doc_id": doc_id})
 
+    def prefetch_doc(self, doc_id: str):
+        """Starts loading a mentioned document while the user is still typing."""
+        self.resource_cache.prefetch(f"docs://documents/{quote(doc_id, safe='')}")
+
+    def prefetch_prompt(self, command: str, doc_id: str):
+        """Starts loading a `/command doc_id` prompt while the user is still typing."""
+        key = (command, doc_id)
+        if key in self._prefetched_prompts:
+            return
+        task = asyncio.create_task(self.doc_client.get_prompt(command, {"doc_id": doc_id}))
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._prefetched_prompts[key] = task
+        while len(self._prefetched_prompts) > self.max_prefetched_prompts:
+            _, stale = self._prefetched_prompts.popitem(last=False)
+            stale.cancel()
+
     async def _extract_resources(self, query: str) -> str:
-        mentions = [word[1:] for word in query.split() if word.startswith("@")]
+        mentions = list(
+            dict.fromkeys(word[1:] for word in query.split() if word.startswith("@"))
+        )
 
-        doc_ids = await self.list_docs_ids()
+        # Mentions are read directly by URI; a mention that can't be read, such
+        # as an unknown doc id, is reported and left out of the prompt.
+        contents = await asyncio.gather(
+            *(self.get_doc_content(doc_id) for doc_id in mentions),
+            return_exceptions=True,
+        )
         mentioned_docs: list[tuple[str, str]] = []
-
-        for doc_id in doc_ids:
-            if doc_id in mentions:
-                content = await self.get_doc_content(doc_id)
+        for doc_id, content in zip(mentions, contents):
+            if isinstance(content, Exception):
+                logger.warning("Could not read @%s: %r", doc_id, content)
+            elif isinstance(content, BaseException):
+                raise content
+            else:
                 mentioned_docs.append((doc_id, content))
 
         return "".join(
@@ -53,9 +100,7 @@ class CliChat(Chat):
         words = query.split()
         command = words[0].replace("/", "")
 
-        messages = await self.doc_client.get_prompt(
-            command, {"doc_id": words[1]}
-        )
+        messages = await self.get_prompt(command, words[1])
         
         self.agent_serve.messages += convert_prompt_messages_to_message_params(messages)
 
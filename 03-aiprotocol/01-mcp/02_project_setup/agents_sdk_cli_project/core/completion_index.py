@@ -0,0 +1,209 @@
+import threading
+from typing import Iterable, Iterator
+
+
+class _TrieNode:
+    __slots__ = ("children", "values")
+
+    def __init__(self):
+        # First character of the edge label -> (edge label, child node).
+        self.children: dict[str, tuple[str, _TrieNode]] = {}
+        self.values: set[str] = set()
+
+
+class PrefixTrie:
+    """A case-folded, path-compressed prefix trie of strings.
+
+    Keys are folded for lookups while the original strings are kept at the
+    nodes. Edges hold whole label segments, so the trie has at most about two
+    nodes per key regardless of key length.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+
+    def insert(self, value: str):
+        node = self._root
+        key = value.casefold()
+        while key:
+            edge = node.children.get(key[0])
+            if edge is None:
+                child = _TrieNode()
+                node.children[key[0]] = (key, child)
+                node = child
+                break
+
+            label, child = edge
+            common = _common_prefix_length(label, key)
+            if common < len(label):
+                # Split the edge where the new key diverges from it.
+                middle = _TrieNode()
+                middle.children[label[common]] = (label[common:], child)
+                node.children[key[0]] = (label[:common], middle)
+                child = middle
+            node = child
+            key = key[common:]
+        node.values.add(value)
+
+    def remove(self, value: str):
+        key = value.casefold()
+        path: list[tuple[_TrieNode, str]] = []
+        node = self._root
+        while key:
+            edge = node.children.get(key[0])
+            if edge is None or not key.startswith(edge[0]):
+                return
+            path.append((node, key[0]))
+            node = edge[1]
+            key = key[len(edge[0]):]
+        node.values.discard(value)
+
+        # Drop the emptied leaf, then merge a parent left with a single child.
+        if path and not node.values and not node.children:
+            parent, first_char = path.pop()
+            del parent.children[first_char]
+            node = parent
+        if path and not node.values and len(node.children) == 1:
+            parent, first_char = path[-1]
+            label, _ = parent.children[first_char]
+            child_label, child = next(iter(node.children.values()))
+            parent.children[first_char] = (label + child_label, child)
+
+    def iter_prefix(self, prefix: str) -> Iterator[str]:
+        """Yields the values under `prefix` in lexicographic order of their keys."""
+        node = self._root
+        key = prefix.casefold()
+        while key:
+            edge = node.children.get(key[0])
+            if edge is None:
+                return
+            label, child = edge
+            if not (label.startswith(key) or key.startswith(label)):
+                return
+            node = child
+            key = key[len(label):]
+
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            yield from sorted(current.values)
+            stack.extend(
+                child for _, (_, child) in sorted(current.children.items(), reverse=True)
+            )
+
+
+class CompletionIndex:
+    """Indexes completion candidates for prefix and fuzzy lookups.
+
+    `search` returns prefix matches from the trie first, then fills up to
+    `limit` with fuzzy matches: candidates that contain the query's characters
+    in order, ranked by how tightly and how early they match. Both lookups are
+    case-insensitive. `update` applies only the difference to the previous
+    set of candidates.
+
+    Updates and searches hold a lock, as the CLI searches from prompt_toolkit's
+    completion thread while the event loop updates the candidates.
+    """
+
+    def __init__(self, limit: int = 50):
+        self.limit = limit
+        self._values: set[str] = set()
+        self._folded: dict[str, str] = {}
+        self._trie = PrefixTrie()
+        # Character -> candidates containing it, to narrow the fuzzy scan.
+        self._by_char: dict[str, set[str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def update(self, values: Iterable[str]):
+        values = set(values)
+        with self._lock:
+            for value in self._values - values:
+                self.remove(value)
+            for value in values - self._values:
+                self.add(value)
+
+    def add(self, value: str):
+        with self._lock:
+            if value in self._values:
+                return
+            folded = value.casefold()
+            self._values.add(value)
+            self._folded[value] = folded
+            self._trie.insert(value)
+            for char in set(folded):
+                self._by_char.setdefault(char, set()).add(value)
+
+    def remove(self, value: str):
+        with self._lock:
+            if value not in self._values:
+                return
+            folded = self._folded.pop(value)
+            self._values.discard(value)
+            self._trie.remove(value)
+            for char in set(folded):
+                candidates = self._by_char[char]
+                candidates.discard(value)
+                if not candidates:
+                    del self._by_char[char]
+
+    def search(self, query: str, limit: int | None = None) -> list[str]:
+        with self._lock:
+            return self._search(query, self.limit if limit is None else limit)
+
+    def _search(self, query: str, limit: int) -> list[str]:
+        results: list[str] = []
+        for value in self._trie.iter_prefix(query):
+            if len(results) >= limit:
+                return results
+            results.append(value)
+
+        if not query or len(results) >= limit:
+            return results
+
+        seen = set(results)
+        return results + self._fuzzy(query.casefold(), limit - len(results), seen)
+
+    def _fuzzy(self, query: str, limit: int, exclude: set[str]) -> list[str]:
+        candidate_sets = []
+        for char in set(query):
+            candidates = self._by_char.get(char)
+            if not candidates:
+                return []
+            candidate_sets.append(candidates)
+        candidates = set.intersection(*sorted(candidate_sets, key=len))
+
+        scored = []
+        for value in candidates - exclude:
+            score = _subsequence_score(query, self._folded[value])
+            if score is not None:
+                scored.append((score, len(value), value))
+        scored.sort()
+        return [value for _, _, value in scored[:limit]]
+
+
+def _subsequence_score(query: str, text: str) -> int | None:
+    """Returns a rank for `query` as a subsequence of `text` (lower is better)."""
+    position = -1
+    start = None
+    gaps = 0
+    for char in query:
+        found = text.find(char, position + 1)
+        if found < 0:
+            return None
+        if start is None:
+            start = found
+        else:
+            gaps += found - position - 1
+        position = found
+    return gaps * 2 + (start or 0)
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    length = min(len(a), len(b))
+    for i in range(length):
+        if a[i] != b[i]:
+            return i
+    return length
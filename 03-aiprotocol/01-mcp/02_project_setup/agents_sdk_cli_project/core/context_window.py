@@ -0,0 +1,159 @@
+import json
+from typing import Any
+
+# Rough average for English text with OpenAI-style tokenizers.
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation, which is no longer shown in full:"
+
+
+def estimate_tokens(item: Any) -> int:
+    if isinstance(item, dict):
+        return len(json.dumps(item, ensure_ascii=False, default=str)) // CHARS_PER_TOKEN + 1
+    return len(str(item)) // CHARS_PER_TOKEN + 1
+
+
+class ContextWindow:
+    """Keeps the conversation history sent to the model within a token budget.
+
+    After every turn, `compact` trims tool outputs longer than
+    `max_tool_output_tokens` and, while the history is still above
+    `max_tokens`, replaces the oldest turns with a short summary line. Turns
+    are only ever dropped whole, so each function call stays next to its
+    output. The latest turn is always kept.
+
+    Token counts are estimates and are cached per item, so only items added
+    since the previous call are measured.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 32_000,
+        max_tool_output_tokens: int = 2_000,
+        max_summary_lines: int = 20,
+    ):
+        self.max_tokens = max_tokens
+        self.max_tool_output_tokens = max_tool_output_tokens
+        self.max_summary_lines = max_summary_lines
+        self._counts: list[int] = []
+
+    @property
+    def token_count(self) -> int:
+        return sum(self._counts)
+
+    def compact(self, messages: list[Any]) -> list[Any]:
+        # New items are appended to the previous history, so the cached
+        # prefix of counts still applies.
+        if len(messages) < len(self._counts):
+            self._counts = []
+        counts = self._counts
+        for item in messages[len(counts):]:
+            self._trim_tool_output(item)
+            counts.append(estimate_tokens(item))
+
+        if sum(counts) > self.max_tokens:
+            messages, counts = self._evict_oldest_turns(messages, counts)
+
+        self._counts = counts
+        return messages
+
+    def _trim_tool_output(self, item: Any):
+        if not isinstance(item, dict) or item.get("type") != "function_call_output":
+            return
+        output = item.get("output")
+        limit = self.max_tool_output_tokens * CHARS_PER_TOKEN
+        if isinstance(output, str) and len(output) > limit:
+            item["output"] = (
+                output[:limit]
+                + f"\n[... {len(output) - limit} characters of tool output trimmed]"
+            )
+
+    def _evict_oldest_turns(
+        self, messages: list[Any], counts: list[int]
+    ) -> tuple[list[Any], list[int]]:
+        summary_lines = []
+        start = 0
+        if messages and _is_summary(messages[0]):
+            summary_lines = messages[0]["content"].splitlines()[1:]
+            start = 1
+
+        turn_starts = [i for i in range(start, len(messages)) if _is_user_message(messages[i])]
+        if len(turn_starts) < 2:
+            return messages, counts
+
+        # Drop whole turns from the front until the rest fits, keeping the last turn.
+        remaining = sum(counts[turn_starts[0]:])
+        cut = turn_starts[0]
+        for next_start in turn_starts[1:]:
+            kept_lines = summary_lines[-self.max_summary_lines:]
+            if remaining + estimate_tokens("\n".join(kept_lines)) <= self.max_tokens:
+                break
+            summary_lines.append(_summarize_turn(messages[cut:next_start]))
+            remaining -= sum(counts[cut:next_start])
+            cut = next_start
+
+        if cut == turn_starts[0]:
+            return messages, counts
+
+        summary = {
+            "role": "user",
+            "content": "\n".join(
+                [SUMMARY_PREFIX, *summary_lines[-self.max_summary_lines:]]
+            ),
+        }
+        return [summary, *messages[cut:]], [estimate_tokens(summary), *counts[cut:]]
+
+
+def _is_user_message(item: Any) -> bool:
+    return (
+        isinstance(item, dict)
+        and item.get("role") == "user"
+        and item.get("type", "message") == "message"
+    )
+
+
+def _is_summary(item: Any) -> bool:
+    return (
+        _is_user_message(item)
+        and isinstance(item.get("content"), str)
+        and item["content"].startswith(SUMMARY_PREFIX)
+    )
+
+
+def _summarize_turn(items: list[Any]) -> str:
+    question = _text_of(items[0])
+    tools = [
+        item["name"]
+        for item in items
+        if isinstance(item, dict) and item.get("type") == "function_call"
+    ]
+    answer = next(
+        (
+            _text_of(item)
+            for item in reversed(items)
+            if isinstance(item, dict) and item.get("role") == "assistant"
+        ),
+        "",
+    )
+    line = f"- User: {_shorten(question)}"
+    if tools:
+        line += f" | Tools used: {', '.join(dict.fromkeys(tools))}"
+    if answer:
+        line += f" | Assistant: {_shorten(answer)}"
+    return line
+
+
+def _text_of(item: dict) -> str:
+    content = item.get("content", "")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    return ""
+
+
+def _shorten(text: str, limit: int = 120) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 3] + "..."
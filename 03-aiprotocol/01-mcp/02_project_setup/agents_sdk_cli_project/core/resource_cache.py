@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from mcp import types
+from mcp_client import MCPClient
+
+
+@dataclass
+class _CachedResource:
+    content: Any
+    fetched_at: float
+    version: str | None = None
+
+
+class ResourceCache:
+    """Caches resource contents read through an MCPClient, keyed by URI.
+
+    When the server supports subscriptions, each cached URI is subscribed to
+    and dropped on `notifications/resources/updated`; such entries never expire
+    on their own. Otherwise entries expire after `ttl` seconds. Callers that
+    know the current version of a resource can pass it to `read` to skip any
+    entry cached under a different version. Concurrent reads of the same URI
+    share a single request.
+    """
+
+    def __init__(
+        self,
+        client: MCPClient,
+        max_entries: int = 256,
+        ttl: float = 30.0,
+        max_prefetched: int = 16,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_prefetched = max_prefetched
+        self._client = client
+        self._entries: OrderedDict[str, _CachedResource] = OrderedDict()
+        # Prefetched URIs not read yet, oldest first.
+        self._prefetched: OrderedDict[str, None] = OrderedDict()
+        self._pending: dict[str, asyncio.Task] = {}
+        self._generations: dict[str, int] = {}
+        self._subscribed: set[str] = set()
+        client.add_notification_handler(self._handle_notification)
+
+    async def read(self, uri: str, version: str | None = None) -> Any:
+        entry = self._entries.get(uri)
+        if entry is not None and self._is_fresh(uri, entry, version):
+            self._entries.move_to_end(uri)
+            self._prefetched.pop(uri, None)
+            return entry.content
+
+        task = self._pending.get(uri) or self._start_fetch(uri, version, prefetch=False)
+        content = await asyncio.shield(task)
+        self._prefetched.pop(uri, None)
+        return content
+
+    def prefetch(self, uri: str):
+        """Starts reading `uri` in the background unless it is cached or in flight."""
+        entry = self._entries.get(uri)
+        if entry is not None and self._is_fresh(uri, entry, None):
+            return
+        if uri not in self._pending:
+            self._start_fetch(uri, None, prefetch=True)
+
+    def invalidate(self, uri: str | None = None):
+        uris = list(self._entries) if uri is None else [uri]
+        for key in uris:
+            self._entries.pop(key, None)
+            self._prefetched.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _is_fresh(self, uri: str, entry: _CachedResource, version: str | None) -> bool:
+        if version is not None and entry.version != version:
+            return False
+        if uri in self._subscribed:
+            return True
+        return time.monotonic() - entry.fetched_at < self.ttl
+
+    def _start_fetch(self, uri: str, version: str | None, prefetch: bool) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch(uri, version, prefetch))
+        self._pending[uri] = task
+        task.add_done_callback(lambda done: self._forget_pending(uri, done))
+        return task
+
+    async def _fetch(self, uri: str, version: str | None, prefetch: bool) -> Any:
+        generation = self._generations.get(uri, 0)
+        # Subscribe before reading, so no update can slip in between the two.
+        await self._subscribe(uri)
+        content = await self._client.read_resource(uri)
+
+        # An update that arrived while the read was in flight makes it stale.
+        if self._generations.get(uri, 0) == generation:
+            self._store(uri, _CachedResource(content, time.monotonic(), version), prefetch)
+        return content
+
+    def _store(self, uri: str, entry: _CachedResource, prefetch: bool):
+        self._entries[uri] = entry
+        self._entries.move_to_end(uri)
+        if prefetch:
+            self._prefetched[uri] = None
+            while len(self._prefetched) > self.max_prefetched:
+                unused, _ = self._prefetched.popitem(last=False)
+                self._entries.pop(unused, None)
+
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._prefetched.pop(evicted, None)
+
+    async def _subscribe(self, uri: str):
+        if uri in self._subscribed or not self._client.supports_resource_subscriptions:
+            return
+        try:
+            await self._client.subscribe_resource(uri)
+        except Exception:
+            return
+        self._subscribed.add(uri)
+
+    def _forget_pending(self, uri: str, task: asyncio.Task):
+        if self._pending.get(uri) is task:
+            del self._pending[uri]
+        # Failed prefetches are never awaited; retrieve the error so it isn't logged.
+        if not task.cancelled():
+            task.exception()
+
+    async def _handle_notification(self, notification: types.ServerNotification):
+        if isinstance(notification.root, types.ResourceUpdatedNotification):
+            self.invalidate(str(notification.root.params.uri))
@@ -0,0 +1,102 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from mcp.types import CallToolResult, Tool
+
+CacheKey = tuple[str, str, str]
+
+
+@dataclass
+class _CachedResult:
+    result: CallToolResult
+    args: dict[str, Any]
+    stored_at: float
+
+
+class ToolResultCache:
+    """Memoizes results of read-only MCP tool calls.
+
+    Only tools annotated with `readOnlyHint`, or named in `allow_list`, are
+    cached, keyed by (server, tool name, canonical JSON arguments). Entries
+    expire after `ttl` seconds and the least recently used are evicted beyond
+    `max_entries`.
+
+    Any other tool call is treated as a write. It drops the cached results on
+    the same server unless they clearly target something else, i.e. share an
+    argument name with a different value (a read of `doc_id="a"` survives an
+    edit of `doc_id="b"`; a search without a `doc_id` does not).
+    """
+
+    def __init__(
+        self,
+        ttl: float = 60.0,
+        max_entries: int = 512,
+        allow_list: set[str] | None = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.allow_list = allow_list or set()
+        self._entries: OrderedDict[CacheKey, _CachedResult] = OrderedDict()
+
+    def is_cacheable(self, tool: Tool) -> bool:
+        if tool.name in self.allow_list:
+            return True
+        return bool(tool.annotations and tool.annotations.readOnlyHint)
+
+    def get(self, server: str, tool_name: str, args: dict[str, Any]) -> CallToolResult | None:
+        key = _key(server, tool_name, args)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry.result
+
+    def put(self, server: str, tool_name: str, args: dict[str, Any], result: CallToolResult):
+        if result.isError:
+            return
+        key = _key(server, tool_name, args)
+        self._entries[key] = _CachedResult(result, args, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate_for_write(self, server: str, args: dict[str, Any]):
+        for key in [
+            key
+            for key, entry in self._entries.items()
+            if key[0] == server and not _targets_differ(entry.args, args)
+        ]:
+            del self._entries[key]
+
+    def invalidate_server(self, server: str):
+        """Drops every result from one server, e.g. after it reports changed data."""
+        for key in [key for key in self._entries if key[0] == server]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+def _key(server: str, tool_name: str, args: dict[str, Any]) -> CacheKey:
+    canonical = json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+    return server, tool_name, canonical
+
+
+def _targets_differ(read_args: dict[str, Any], write_args: dict[str, Any]) -> bool:
+    return any(
+        name in read_args
+        and _is_scalar(value)
+        and _is_scalar(read_args[name])
+        and read_args[name] != value
+        for name, value in write_args.items()
+    )
+
+
+def _is_scalar(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool))
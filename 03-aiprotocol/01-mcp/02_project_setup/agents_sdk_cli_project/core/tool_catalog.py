@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable
+
+from mcp import types
+from mcp_client import MCPClient, fan_out
+
+# OpenAI-compatible function names: letters, digits, "_" and "-", at most 64 chars.
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_-]")
+_MAX_NAME_LENGTH = 64
+
+
+@dataclass
+class CatalogEntry:
+    name: str
+    """The name exposed to the model. Namespaced when several servers share a tool name."""
+
+    tool: types.Tool
+    server: str
+    client: MCPClient
+
+
+@dataclass
+class _ServerTools:
+    tools: list[types.Tool] = field(default_factory=list)
+    fetched_at: float | None = None
+    failed_at: float | None = None
+    stale: bool = True
+
+
+class ToolCatalog:
+    """Caches the tools of every MCP server and indexes them by exposed name.
+
+    Each server is listed once and then only again when it sends
+    `notifications/tools/list_changed` or its entry is older than `ttl` seconds.
+    Servers are refreshed concurrently; one that fails or times out keeps its
+    previously cached tools and is retried after `retry_after` seconds.
+    """
+
+    def __init__(
+        self,
+        clients: dict[str, MCPClient] | None = None,
+        ttl: float = 300.0,
+        retry_after: float = 30.0,
+    ):
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.version = 0
+        self._clients: dict[str, MCPClient] = {}
+        self._servers: dict[str, _ServerTools] = {}
+        self._entries: list[CatalogEntry] = []
+        self._dirty = True
+        self._lock = asyncio.Lock()
+        self._change_listeners: list[Callable[[str], None]] = []
+        self.set_clients(clients or {})
+
+    def set_clients(self, clients: dict[str, MCPClient]):
+        """Tracks the given clients, keeping cached tools of the ones already known."""
+        for name, client in clients.items():
+            if self._clients.get(name) is not client:
+                self._servers[name] = _ServerTools()
+                client.add_notification_handler(self._notification_handler(name, client))
+                self._dirty = True
+
+        for name in self._clients.keys() - clients.keys():
+            del self._servers[name]
+            self._dirty = True
+
+        self._clients = dict(clients)
+
+    def add_change_listener(self, listener: Callable[[str], None]):
+        """Registers a callback run with a server's name when it reports changed resources."""
+        self._change_listeners.append(listener)
+
+    def invalidate(self, server: str | None = None):
+        """Forces a refresh of one server, or of all servers, on the next lookup."""
+        for name, state in self._servers.items():
+            if server is None or name == server:
+                state.stale = True
+                state.failed_at = None
+
+    async def get_entries(self) -> list[CatalogEntry]:
+        """Returns the merged tools of all servers, refreshing expired servers first."""
+        async with self._lock:
+            now = time.monotonic()
+            expired = {
+                name: client
+                for name, client in self._clients.items()
+                if self._needs_refresh(self._servers[name], now)
+            }
+            if expired:
+                listed = await fan_out(expired, lambda client: client.list_tools())
+                for name, tools in listed.results.items():
+                    state = self._servers[name]
+                    state.tools = tools
+                    state.fetched_at = now
+                    state.failed_at = None
+                    state.stale = False
+                    self._dirty = True
+                for name in listed.errors:
+                    self._servers[name].failed_at = now
+
+            if self._dirty:
+                self._rebuild_index()
+            return self._entries
+
+    def _needs_refresh(self, state: _ServerTools, now: float) -> bool:
+        if state.failed_at is not None and now - state.failed_at < self.retry_after:
+            return False
+        return (
+            state.stale
+            or state.fetched_at is None
+            or now - state.fetched_at > self.ttl
+        )
+
+    def _rebuild_index(self):
+        counts = Counter(
+            tool.name for state in self._servers.values() for tool in state.tools
+        )
+
+        entries = []
+        for server in self._clients:
+            for tool in self._servers[server].tools:
+                name = tool.name
+                if counts[name] > 1:
+                    name = _namespaced(server, tool.name)
+                entries.append(
+                    CatalogEntry(
+                        name=name,
+                        tool=tool,
+                        server=server,
+                        client=self._clients[server],
+                    )
+                )
+
+        self._entries = entries
+        self._dirty = False
+        self.version += 1
+
+    def _notification_handler(self, server: str, client: MCPClient):
+        async def handle(notification: types.ServerNotification):
+            # Ignore notifications from a client that has since been replaced.
+            if self._clients.get(server) is not client:
+                return
+            if isinstance(notification.root, types.ToolListChangedNotification):
+                self.invalidate(server)
+            elif isinstance(
+                notification.root,
+                (types.ResourceUpdatedNotification, types.ResourceListChangedNotification),
+            ):
+                for listener in self._change_listeners:
+                    listener(server)
+
+        return handle
+
+
+def _namespaced(server: str, tool_name: str) -> str:
+    name = _INVALID_NAME_CHARS.sub("_", f"{server}__{tool_name}")
+    if len(name) <= _MAX_NAME_LENGTH:
+        return name
+    # Keep the server prefix and shorten the tail; a hash of the full name
+    # keeps tools that only differ past the cut apart.
+    digest = hashlib.sha1(name.encode()).hexdigest()[:8]
+    return f"{name[:_MAX_NAME_LENGTH - len(digest) - 1]}_{digest}"
@@ -0,0 +1,90 @@
+import asyncio
+from dataclasses import dataclass
+
+from agents.tool import FunctionTool
+from core.tool_cache import ToolResultCache
+from core.tool_catalog import CatalogEntry
+from core.tools import ToolManager
+
+
+@dataclass
+class _Registered:
+    entry: CatalogEntry
+    function_tool: FunctionTool
+
+
+class ToolRegistry:
+    """Keeps the agent's FunctionTools in sync with the tool catalog.
+
+    `tools` is a single list that is updated in place, so the agent can hold on
+    to it between turns. Only tools whose catalog entry changed are rebuilt;
+    unchanged ones keep their FunctionTool, closure and schema object.
+
+    All tools share one cap of `max_concurrent_calls` in-flight calls, and each
+    call is given up after `call_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        result_cache: ToolResultCache | None = None,
+        max_concurrent_calls: int = 16,
+        call_timeout: float | None = 60.0,
+    ):
+        self.result_cache = result_cache
+        self.call_timeout = call_timeout
+        self._call_slots = asyncio.Semaphore(max_concurrent_calls)
+        self.tools: list[FunctionTool] = []
+        self._registered: dict[str, _Registered] = {}
+        self._catalog_version: int | None = None
+
+    def sync(self, entries: list[CatalogEntry], catalog_version: int | None = None) -> bool:
+        """Applies the catalog entries. Returns whether the tool list changed."""
+        if catalog_version is not None and catalog_version == self._catalog_version:
+            return False
+
+        registered: dict[str, _Registered] = {}
+        changed = len(entries) != len(self._registered)
+        for entry in entries:
+            previous = self._registered.get(entry.name)
+            if previous is not None and _same_tool(previous.entry, entry):
+                registered[entry.name] = _Registered(entry, previous.function_tool)
+            else:
+                registered[entry.name] = _Registered(entry, self._to_function_tool(entry))
+                changed = True
+
+        self._registered = registered
+        self._catalog_version = catalog_version
+        if changed or [tool.name for tool in self.tools] != list(registered):
+            self.tools[:] = [item.function_tool for item in registered.values()]
+            return True
+        return False
+
+    def _to_function_tool(self, entry: CatalogEntry) -> FunctionTool:
+        cache = self.result_cache
+        return FunctionTool(
+            name=entry.name,
+            description=entry.tool.description or "",
+            params_json_schema=entry.tool.inputSchema,
+            on_invoke_tool=ToolManager.execute_tool_dynamically(
+                entry.tool.name,
+                entry.client,
+                server=entry.server,
+                cache=cache,
+                read_only=cache is not None and cache.is_cacheable(entry.tool),
+                call_slots=self._call_slots,
+                timeout=self.call_timeout,
+            ),
+        )
+
+
+def _same_tool(previous: CatalogEntry, current: CatalogEntry) -> bool:
+    if previous.client is not current.client or previous.server != current.server:
+        return False
+    if previous.tool is current.tool:
+        return True
+    return (
+        previous.tool.name == current.tool.name
+        and previous.tool.description == current.tool.description
+        and previous.tool.inputSchema == current.tool.inputSchema
+        and previous.tool.annotations == current.tool.annotations
+    )
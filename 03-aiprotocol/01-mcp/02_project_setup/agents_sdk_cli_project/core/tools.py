@@ -1,38 +1,77 @@
+import asyncio
 import json
-from mcp.types import CallToolResult, Tool
+from mcp.shared.exceptions import McpError
+from mcp.types import CallToolResult, TextContent
 from mcp_client import MCPClient
+from core.tool_cache import ToolResultCache
 
 from agents.tool_context import ToolContext
 
 class ToolManager:
     @classmethod
-    async def get_all_tools(cls, clients: dict[str, MCPClient]) -> list[Tool]:
-        """Gets all tools from the provided clients."""
-        tools = []
-        for client in clients.values():
-            tool_models = await client.list_tools()
-            tools = tool_models if tool_models else []
-        return tools
+    def execute_tool_dynamically(
+        cls,
+        tool_name,
+        mcp_client: MCPClient,
+        server: str = "",
+        cache: ToolResultCache | None = None,
+        read_only: bool = False,
+        call_slots: asyncio.Semaphore | None = None,
+        timeout: float | None = None,
+    ):
+        """Builds the FunctionTool callback that forwards a call to the MCP server.
 
-    @classmethod
-    async def _find_client_with_tool(
-        cls, clients: list[MCPClient], tool_name: str
-    ) -> MCPClient | None:
-        """Finds the first client that has the specified tool."""
-        for client in clients:
-            tools = await client.list_tools()
-            tool = next((t for t in tools if t.name == tool_name), None)
-            if tool:
-                return client
-        return None
+        With a cache, results of read-only tools are memoized and every other
+        call invalidates the cached results it may have changed. `call_slots`
+        caps concurrent calls across all tools sharing it. A call that times
+        out or fails in the transport returns an error result to the model
+        instead of failing the run.
+        """
+        async def execute_tool(ctx: ToolContext, args: str) -> CallToolResult | None:
+            parsed_args = json.loads(args) if args else {}
 
+            if cache is not None and read_only:
+                cached = cache.get(server, tool_name, parsed_args)
+                if cached is not None:
+                    return cached
 
-    @classmethod
-    def execute_tool_dynamically(cls, tool_name, mcp_client: MCPClient):
-        """Execute a simulated database query."""
-        async def execute_tool(ctx: ToolContext, args: str) -> CallToolResult:
-            parsed_args = json.loads(args)
-            result = await mcp_client.call_tool(tool_name, parsed_args)
+            try:
+                result = await asyncio.wait_for(
+                    cls._call_tool(mcp_client, tool_name, parsed_args, call_slots),
+                    timeout,
+                )
+            except asyncio.TimeoutError:
+                result = _error_result(tool_name, f"Tool call timed out after {timeout}s")
+            except (McpError, ConnectionError) as e:
+                result = _error_result(tool_name, str(e))
+
+            if cache is not None:
+                if read_only:
+                    if result is not None:
+                        cache.put(server, tool_name, parsed_args, result)
+                else:
+                    cache.invalidate_for_write(server, parsed_args)
             return result
         
         return execute_tool
+
+    @classmethod
+    async def _call_tool(
+        cls,
+        mcp_client: MCPClient,
+        tool_name: str,
+        args: dict,
+        call_slots: asyncio.Semaphore | None,
+    ) -> CallToolResult | None:
+        if call_slots is None:
+            return await mcp_client.call_tool(tool_name, args)
+        async with call_slots:
+            return await mcp_client.call_tool(tool_name, args)
+
+
+def _error_result(tool_name: str, message: str) -> CallToolResult:
+    error = {"error": message, "tool": tool_name}
+    return CallToolResult(
+        content=[TextContent(type="text", text=json.dumps(error))],
+        isError=True,
+    )
@@ -0,0 +1,320 @@
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+from document_store.document import VersionConflictError
+from document_store.piece_table import PieceTable
+from document_store.text_source import StringSource
+
+Steps = list[list[tuple[int, int, str]]]
+"""An edit as PieceTable.splice_many calls, each on the result of the one before."""
+
+
+class Change(NamedTuple):
+    doc_id: str
+    event: str
+    """"added", "updated" or "deleted"."""
+    version: int | None = None
+    """The document's version after the change; None for deletions."""
+    steps: Steps | None = None
+    """For edits saved with `save`, the edit itself; None when the whole text was replaced."""
+
+
+def apply_steps(text: PieceTable, steps: Steps) -> PieceTable:
+    for edits in steps:
+        text = text.splice_many([tuple(edit) for edit in edits])
+    return text
+
+
+class StorageBackend(ABC):
+    """Durable document storage shared by several server processes.
+
+    Every write bumps the document's version and appends to a change log
+    numbered by a store-wide generation counter. Processes cache documents
+    locally and compare their last seen generation with `generation()` to
+    learn, cheaply, whether anything they hold has changed. Edits are logged
+    as the splices that make them, so a process holding the version before
+    can apply them to its copy instead of reloading the document.
+    """
+
+    @abstractmethod
+    def generation(self) -> int:
+        """The number of the latest change, 0 before the first one."""
+
+    @abstractmethod
+    def changes_since(self, generation: int) -> tuple[int, list[Change] | None]:
+        """Returns the latest generation and the changes after `generation`, oldest first.
+
+        The list is None when those changes are no longer all in the log, in
+        which case the caller should discard everything it cached.
+        """
+
+    @abstractmethod
+    def ids(self) -> list[str]:
+        """Every document id, sorted."""
+
+    @abstractmethod
+    def load(self, doc_id: str) -> tuple[str, int] | None:
+        """Returns the document's text and version, or None if there is no such document."""
+
+    @abstractmethod
+    def put(self, doc_id: str, text: str, only_if_absent: bool = False) -> tuple[int, int] | None:
+        """Stores text as the document's next version, or as version 1 of a new document.
+
+        Returns (version, generation), or None if only_if_absent is set and
+        the document exists.
+        """
+
+    @abstractmethod
+    def save(self, doc_id: str, steps: Steps, base_version: int) -> tuple[int, int]:
+        """Applies an edit to base_version, if the document is still at it, as the next version.
+
+        Returns (version, generation). Raises VersionConflictError if another
+        write got there first, KeyError if the document does not exist.
+        """
+
+    @abstractmethod
+    def delete(self, doc_id: str) -> int | None:
+        """Deletes the document and returns the generation, or None if there was no such document."""
+
+    @abstractmethod
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """Takes or renews the lease `name` for ttl seconds.
+
+        Returns whether holder has it, so one process can be picked to do
+        work, like watching a directory, that should not be done by all.
+        """
+
+
+class SqliteBackend(StorageBackend):
+    """A StorageBackend in one SQLite database, in WAL mode.
+
+    WAL lets any number of processes read while one writes, and writes are
+    serialized by SQLite's own file locking. Each thread gets its own
+    connection. The change log is pruned to its last `log_size` entries.
+
+    A save stores just the edit, so its cost does not grow with the
+    document. A document's text is kept as of `text_version` together with
+    the edits since; once `compact_after` edits pile up, the next save
+    rewrites the text with them applied. That rewrite is the one write
+    proportional to the document, made once per `compact_after` edits, and
+    bounds the edits `load` has to apply.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            doc_id TEXT PRIMARY KEY,
+            text TEXT NOT NULL,
+            text_version INTEGER NOT NULL,
+            version INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS edits (
+            doc_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            steps TEXT NOT NULL,
+            PRIMARY KEY (doc_id, version)
+        );
+        CREATE TABLE IF NOT EXISTS changes (
+            generation INTEGER PRIMARY KEY AUTOINCREMENT,
+            doc_id TEXT NOT NULL,
+            event TEXT NOT NULL,
+            version INTEGER,
+            steps TEXT
+        );
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        busy_timeout: float = 30.0,
+        log_size: int = 100_000,
+        compact_after: int = 64,
+    ):
+        self.path = str(path)
+        self.busy_timeout = busy_timeout
+        self.log_size = log_size
+        self.compact_after = compact_after
+        self._local = threading.local()
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode, so transactions are begun explicitly below.
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # Take the write lock up front, so two writers never deadlock
+        # trying to upgrade their read locks.
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def generation(self) -> int:
+        row = self._connection().execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'changes'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, generation: int) -> tuple[int, list[Change] | None]:
+        connection = self._connection()
+        latest = self.generation()
+        if latest == generation:
+            return latest, []
+        oldest = connection.execute("SELECT MIN(generation) FROM changes").fetchone()[0]
+        if oldest is None or oldest > generation + 1:
+            return latest, None
+        rows = connection.execute(
+            "SELECT doc_id, event, version, steps FROM changes"
+            " WHERE generation > ? AND generation <= ? ORDER BY generation",
+            (generation, latest),
+        ).fetchall()
+        return latest, [
+            Change(doc_id, event, version, steps and json.loads(steps))
+            for doc_id, event, version, steps in rows
+        ]
+
+    def ids(self) -> list[str]:
+        rows = self._connection().execute("SELECT doc_id FROM documents ORDER BY doc_id").fetchall()
+        return [doc_id for doc_id, in rows]
+
+    def load(self, doc_id: str) -> tuple[str, int] | None:
+        # One read transaction, so the text and its edits are consistent.
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            return self._load(connection, doc_id)
+        finally:
+            connection.execute("COMMIT")
+
+    def _load(self, connection: sqlite3.Connection, doc_id: str) -> tuple[str, int] | None:
+        row = connection.execute(
+            "SELECT text, text_version, version FROM documents WHERE doc_id = ?", (doc_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        text, text_version, version = row
+        if text_version == version:
+            return text, version
+        table = PieceTable.from_source(StringSource(text))
+        for (steps,) in connection.execute(
+            "SELECT steps FROM edits WHERE doc_id = ? AND version > ? ORDER BY version",
+            (doc_id, text_version),
+        ):
+            table = apply_steps(table, json.loads(steps))
+        return table.text(), version
+
+    def put(self, doc_id: str, text: str, only_if_absent: bool = False) -> tuple[int, int] | None:
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT version FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            if row is None:
+                version, event = 1, "added"
+                connection.execute(
+                    "INSERT INTO documents (doc_id, text, text_version, version) VALUES (?, ?, 1, 1)",
+                    (doc_id, text),
+                )
+            elif only_if_absent:
+                return None
+            else:
+                version, event = row[0] + 1, "updated"
+                connection.execute(
+                    "UPDATE documents SET text = ?, text_version = ?, version = ? WHERE doc_id = ?",
+                    (text, version, version, doc_id),
+                )
+                connection.execute("DELETE FROM edits WHERE doc_id = ?", (doc_id,))
+            return version, self._log(connection, doc_id, event, version)
+
+    def save(self, doc_id: str, steps: Steps, base_version: int) -> tuple[int, int]:
+        version = base_version + 1
+        encoded = json.dumps(steps)
+        with self._transaction() as connection:
+            updated = connection.execute(
+                "UPDATE documents SET version = ? WHERE doc_id = ? AND version = ?",
+                (version, doc_id, base_version),
+            ).rowcount
+            if not updated:
+                row = connection.execute(
+                    "SELECT version FROM documents WHERE doc_id = ?", (doc_id,)
+                ).fetchone()
+                if row is None:
+                    raise KeyError(doc_id)
+                raise VersionConflictError(doc_id, base_version, row[0])
+            connection.execute(
+                "INSERT INTO edits (doc_id, version, steps) VALUES (?, ?, ?)", (doc_id, version, encoded)
+            )
+            (text_version,) = connection.execute(
+                "SELECT text_version FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            if version - text_version >= self.compact_after:
+                text, _ = self._load(connection, doc_id)
+                connection.execute(
+                    "UPDATE documents SET text = ?, text_version = ? WHERE doc_id = ?", (text, version, doc_id)
+                )
+                connection.execute("DELETE FROM edits WHERE doc_id = ?", (doc_id,))
+            return version, self._log(connection, doc_id, "updated", version, encoded)
+
+    def delete(self, doc_id: str) -> int | None:
+        with self._transaction() as connection:
+            if not connection.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,)).rowcount:
+                return None
+            connection.execute("DELETE FROM edits WHERE doc_id = ?", (doc_id,))
+            return self._log(connection, doc_id, "deleted")
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                """
+                INSERT INTO leases (name, holder, expires) VALUES (?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires = excluded.expires
+                WHERE leases.holder = excluded.holder OR leases.expires < ?
+                """,
+                (name, holder, now + ttl, now),
+            )
+            row = connection.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+            return row[0] == holder
+
+    def _log(
+        self,
+        connection: sqlite3.Connection,
+        doc_id: str,
+        event: str,
+        version: int | None = None,
+        steps: str | None = None,
+    ) -> int:
+        generation = connection.execute(
+            "INSERT INTO changes (doc_id, event, version, steps) VALUES (?, ?, ?, ?)",
+            (doc_id, event, version, steps),
+        ).lastrowid
+        if generation % 1000 == 0:
+            connection.execute("DELETE FROM changes WHERE generation <= ?", (generation - self.log_size,))
+        return generation
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
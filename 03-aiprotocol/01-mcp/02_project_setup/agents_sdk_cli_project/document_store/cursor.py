@@ -0,0 +1,20 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(**position) -> str:
+    """Packs a position into an opaque, URL-safe cursor string."""
+    data = json.dumps(position, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}") from None
+    if not isinstance(position, dict):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return position
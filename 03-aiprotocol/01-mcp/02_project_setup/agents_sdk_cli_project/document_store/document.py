@@ -0,0 +1,76 @@
+import threading
+from dataclasses import dataclass
+
+from document_store.piece_table import PieceTable
+from document_store.text_source import MappedFileSource, TextSource
+
+
+class VersionConflictError(ValueError):
+    def __init__(self, doc_id: str, expected: int, actual: int):
+        super().__init__(
+            f"Doc with id {doc_id} is at version {actual}, not the expected version {expected}"
+        )
+        self.doc_id = doc_id
+        self.expected = expected
+        self.actual = actual
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    text: PieceTable
+    version: int
+
+
+class Document:
+    """A versioned document whose edits are applied by compare-and-swap.
+
+    Readers take the current snapshot without locking and keep a consistent
+    view for as long as they hold it. Writers build a new piece table from a
+    snapshot and publish it with `commit`, which succeeds only if no other
+    edit was published in between. The lock guards just that check and the
+    pointer swap; Python offers no atomic compare-and-swap on its own.
+
+    Memory-mapped files the text no longer refers to, after a replacement or
+    a compaction, are closed on commit, and `close` closes the rest once the
+    document is dropped. Either way a file stays mapped until no snapshot
+    that reads from it is left.
+    """
+
+    def __init__(self, doc_id: str, source: TextSource, max_pieces: int = 1024, version: int = 1):
+        self.doc_id = doc_id
+        self.max_pieces = max_pieces
+        self._snapshot = Snapshot(PieceTable.from_source(source), version)
+        self._swap_lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def commit(self, text: PieceTable, base_version: int | None = None) -> Snapshot:
+        """Publishes text as the next version.
+
+        With base_version set, raises VersionConflictError unless the document
+        is still at that version.
+        """
+        if len(text.pieces) > self.max_pieces:
+            text = text.compacted()
+        with self._swap_lock:
+            current = self._snapshot
+            if base_version is not None and current.version != base_version:
+                raise VersionConflictError(self.doc_id, base_version, current.version)
+            self._snapshot = Snapshot(text, current.version + 1)
+        for source in _mapped_sources(current.text) - _mapped_sources(text):
+            source.close()
+        return self._snapshot
+
+    def close(self):
+        for source in _mapped_sources(self._snapshot.text):
+            source.close()
+
+
+def _mapped_sources(text: PieceTable) -> set[MappedFileSource]:
+    return {piece.source for piece in text.pieces if isinstance(piece.source, MappedFileSource)}
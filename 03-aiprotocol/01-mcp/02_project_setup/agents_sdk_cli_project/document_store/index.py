@@ -0,0 +1,100 @@
+import heapq
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[tuple[str, int]]:
+    """Splits text into lowercase terms along with their character offsets."""
+    return [(match.group().lower(), match.start()) for match in _TOKEN.finditer(text)]
+
+
+@dataclass
+class SearchHit:
+    doc_id: str
+    score: float
+    offsets: list[int]
+    """Offsets of the matched query terms in the document, in ascending order."""
+
+
+class InvertedIndex:
+    """An in-memory inverted index ranked with Okapi BM25.
+
+    Postings map each term to the documents containing it and the character
+    offsets of every occurrence. Documents are indexed and removed one at a
+    time, so an edit only re-tokenizes the edited document.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[str, list[int]]] = {}
+        self._doc_terms: dict[str, set[str]] = {}
+        self._doc_lengths: dict[str, int] = {}
+        self._total_length = 0
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_lengths
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Indexes a document, replacing any previous version of it."""
+        self.remove(doc_id)
+
+        tokens = tokenize(text)
+        terms: dict[str, list[int]] = {}
+        for term, offset in tokens:
+            terms.setdefault(term, []).append(offset)
+        for term, offsets in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = offsets
+
+        self._doc_terms[doc_id] = set(terms)
+        self._doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id: str):
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+
+    def search(self, query: str, limit: int = 10) -> list[SearchHit]:
+        terms = Counter(term for term, _ in tokenize(query))
+        if not terms or not self._doc_lengths:
+            return []
+
+        doc_count = len(self._doc_lengths)
+        average_length = self._total_length / doc_count or 1.0
+        scores: dict[str, float] = {}
+
+        for term, query_frequency in terms.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, positions in postings.items():
+                frequency = len(positions)
+                length_norm = 1 - self.b + self.b * self._doc_lengths[doc_id] / average_length
+                score = idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score * query_frequency
+
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            SearchHit(
+                doc_id=doc_id,
+                score=score,
+                offsets=sorted(
+                    offset
+                    for term in terms
+                    for offset in self._postings.get(term, {}).get(doc_id, ())
+                ),
+            )
+            for doc_id, score in ranked
+        ]
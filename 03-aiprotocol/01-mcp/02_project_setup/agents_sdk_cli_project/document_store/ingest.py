@@ -0,0 +1,319 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, NamedTuple, TextIO
+from xml.etree import ElementTree
+
+from document_store.store import DocumentNotFoundError, DocumentStore
+
+logger = logging.getLogger(__name__)
+
+_WORD = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+class UnsupportedDocumentError(ValueError):
+    pass
+
+
+class MissingDependencyError(UnsupportedDocumentError):
+    """The file could be read once an optional package is installed."""
+
+
+def _extract_plain(path: Path, out: TextIO):
+    with open(path, encoding="utf-8", errors="replace") as file:
+        while block := file.read(1 << 20):
+            out.write(block)
+
+
+def _extract_docx(path: Path, out: TextIO):
+    # Stream word/document.xml rather than building the whole tree.
+    with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as xml:
+        for _, element in ElementTree.iterparse(xml, events=("end",)):
+            if element.tag == _WORD + "t":
+                out.write(element.text or "")
+            elif element.tag == _WORD + "tab":
+                out.write("\t")
+            elif element.tag in (_WORD + "br", _WORD + "cr"):
+                out.write("\n")
+            elif element.tag == _WORD + "p":
+                out.write("\n")
+                element.clear()
+
+
+def _extract_pdf(path: Path, out: TextIO):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise MissingDependencyError("Reading PDF files needs the pypdf package") from None
+    for page in PdfReader(path).pages:
+        out.write(page.extract_text() or "")
+        out.write("\n\n")
+
+
+EXTRACTORS = {
+    ".txt": _extract_plain,
+    ".md": _extract_plain,
+    ".docx": _extract_docx,
+    ".pdf": _extract_pdf,
+}
+
+
+def extract_to_file(source: str, target: str):
+    """Writes the text of source to target.
+
+    Runs in a worker process. The text is written to a temporary file that
+    is renamed into place, so a cached text file is never seen half-written.
+    """
+    source_path = Path(source)
+    extractor = EXTRACTORS.get(source_path.suffix.lower())
+    if extractor is None:
+        raise UnsupportedDocumentError(f"No extractor for {source_path.suffix} files")
+    partial = Path(f"{target}.partial")
+    with open(partial, "w", encoding="utf-8") as out:
+        extractor(source_path, out)
+    os.replace(partial, target)
+
+
+class ExtractionFailure(NamedTuple):
+    message: str
+    missing_dependency: bool = False
+
+
+def extract_batch(jobs: list[tuple[str, str]]) -> list[ExtractionFailure | None]:
+    """Runs extract_to_file for each (source, target) pair and returns each failure, or None."""
+    errors = []
+    for source, target in jobs:
+        try:
+            extract_to_file(source, target)
+            errors.append(None)
+        except Exception as error:
+            errors.append(ExtractionFailure(
+                str(error) or type(error).__name__, isinstance(error, MissingDependencyError)
+            ))
+    return errors
+
+
+@dataclass
+class CacheEntry:
+    mtime_ns: int
+    size: int
+    text_file: str | None
+    """Name of the extracted text in the cache directory, None if extraction failed."""
+    error: str | None = None
+
+
+class ExtractionCache:
+    """Extracted text of each source file, persisted across restarts.
+
+    A manifest records the mtime and size each text was extracted from, so
+    an unchanged file is served from its cached text without parsing it.
+    Entries recorded with persist=False, such as failures that installing a
+    package would fix, last only until the process exits.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.entries: dict[str, CacheEntry] = {}
+        self._unsaved: set[str] = set()
+        manifest = self.directory / self.MANIFEST
+        if manifest.exists():
+            try:
+                data = json.loads(manifest.read_text())
+                self.entries = {name: CacheEntry(**entry) for name, entry in data.items()}
+            except (ValueError, TypeError) as error:
+                logger.warning("Ignoring unreadable extraction cache manifest: %s", error)
+
+    def lookup(self, name: str, stat: os.stat_result) -> CacheEntry | None:
+        entry = self.entries.get(name)
+        if entry is None or entry.mtime_ns != stat.st_mtime_ns or entry.size != stat.st_size:
+            return None
+        if entry.text_file is not None and not (self.directory / entry.text_file).exists():
+            return None
+        return entry
+
+    def text_path(self, name: str, stat: os.stat_result) -> Path:
+        key = hashlib.sha1(f"{name}\0{stat.st_mtime_ns}\0{stat.st_size}".encode()).hexdigest()
+        return self.directory / f"{key}.txt"
+
+    def record(self, name: str, entry: CacheEntry, persist: bool = True):
+        previous = self.entries.get(name)
+        self.entries[name] = entry
+        if persist:
+            self._unsaved.discard(name)
+        else:
+            self._unsaved.add(name)
+        if previous is not None and previous.text_file not in (None, entry.text_file):
+            (self.directory / previous.text_file).unlink(missing_ok=True)
+
+    def forget(self, name: str):
+        entry = self.entries.pop(name, None)
+        self._unsaved.discard(name)
+        if entry is not None and entry.text_file is not None:
+            (self.directory / entry.text_file).unlink(missing_ok=True)
+
+    def dumps(self) -> str:
+        return json.dumps({
+            name: asdict(entry) for name, entry in self.entries.items() if name not in self._unsaved
+        })
+
+    def save(self, manifest_json: str | None = None):
+        """Writes the manifest, or manifest_json taken earlier with dumps."""
+        if manifest_json is None:
+            manifest_json = self.dumps()
+        manifest = self.directory / self.MANIFEST
+        partial = manifest.with_suffix(".partial")
+        partial.write_text(manifest_json)
+        os.replace(partial, manifest)
+
+
+class DirectoryIngestor:
+    """Keeps a DocumentStore in sync with the supported files in a directory.
+
+    Each scan compares file mtimes and sizes with the extraction cache and
+    parses only new or modified files, in a process pool. Every document is
+    swapped into the store, text and index together, in a single step, so
+    readers see either the old or the new version while ingestion runs.
+    Texts of at least `mmap_threshold` bytes are served from a memory map of
+    the cached file; smaller ones are loaded, which keeps the number of
+    open maps low for large corpora.
+
+    When several processes share one store backend, pass a `lease` that
+    returns True in only one of them at a time; the others skip their scans.
+    """
+
+    def __init__(
+        self,
+        store: DocumentStore,
+        directory: str | Path,
+        cache_dir: str | Path | None = None,
+        workers: int | None = None,
+        poll_interval: float = 5.0,
+        mmap_threshold: int = 1 << 20,
+        batch_size: int = 32,
+        lease: Callable[[], bool] | None = None,
+    ):
+        self.store = store
+        self.directory = Path(directory)
+        self.cache = ExtractionCache(cache_dir or self.directory / ".extraction_cache")
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.mmap_threshold = mmap_threshold
+        self.batch_size = batch_size
+        self.lease = lease
+        self._pool: ProcessPoolExecutor | None = None
+        self._scan_lock = asyncio.Lock()
+
+    async def watch(self):
+        """Scans now and then every poll_interval seconds, until cancelled."""
+        while True:
+            try:
+                if self.lease is None or await asyncio.to_thread(self.lease):
+                    await self.scan()
+            except Exception:
+                logger.exception("Scanning %s failed", self.directory)
+            await asyncio.sleep(self.poll_interval)
+
+    async def scan(self) -> int:
+        """Ingests new and modified files, drops deleted ones, and returns the number of changes."""
+        async with self._scan_lock:
+            files = await asyncio.to_thread(self._list_files)
+            changes = 0
+
+            for name in set(self.cache.entries) - set(files):
+                self.cache.forget(name)
+                try:
+                    self.store.delete(name)
+                except DocumentNotFoundError:
+                    pass
+                changes += 1
+            if changes:
+                await self._save_cache()
+
+            stale = []
+            cached = []
+            for name, stat in files.items():
+                entry = self.cache.lookup(name, stat)
+                if entry is None:
+                    stale.append((name, stat))
+                elif name not in self.store and entry.text_file is not None:
+                    # Unchanged since the last run: load the cached text.
+                    cached.append((name, self.cache.directory / entry.text_file))
+            if cached:
+                await asyncio.to_thread(self._load_all, cached)
+
+            # Files go to the workers in batches to amortize the hand-off.
+            batches = [
+                stale[start:start + self.batch_size]
+                for start in range(0, len(stale), self.batch_size)
+            ]
+            for completed in asyncio.as_completed([self._ingest(batch) for batch in batches]):
+                changes += await completed
+                # Saved batch by batch, so an interrupted scan keeps its progress.
+                await self._save_cache()
+            return changes
+
+    async def _save_cache(self):
+        # Serialized here, as batches still in flight record entries on this thread.
+        await asyncio.to_thread(self.cache.save, self.cache.dumps())
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def _ingest(self, files: list[tuple[str, os.stat_result]]) -> int:
+        targets = [self.cache.text_path(name, stat) for name, stat in files]
+        errors = await asyncio.get_running_loop().run_in_executor(
+            self._get_pool(),
+            extract_batch,
+            [(str(self.directory / name), str(target)) for (name, _), target in zip(files, targets)],
+        )
+
+        extracted = []
+        for (name, stat), target, error in zip(files, targets, errors):
+            if error is None:
+                extracted.append((name, target))
+                self.cache.record(name, CacheEntry(stat.st_mtime_ns, stat.st_size, target.name))
+            else:
+                logger.warning("Could not extract text from %s: %s", name, error.message)
+                # Retried after a restart, by when the package may be installed.
+                self.cache.record(
+                    name,
+                    CacheEntry(stat.st_mtime_ns, stat.st_size, None, error.message),
+                    persist=not error.missing_dependency,
+                )
+        await asyncio.to_thread(self._load_all, extracted)
+        return len(files)
+
+    def _load_all(self, texts: list[tuple[str, Path]]):
+        for name, text_path in texts:
+            if text_path.stat().st_size >= self.mmap_threshold:
+                self.store.put_file(name, text_path)
+            else:
+                self.store.put(name, text_path.read_text(encoding="utf-8"))
+
+    def _list_files(self) -> dict[str, os.stat_result]:
+        files = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and Path(entry.name).suffix.lower() in EXTRACTORS:
+                    files[entry.name] = entry.stat()
+        return files
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned workers, as forking a process that runs threads is unsafe.
+            self._pool = ProcessPoolExecutor(
+                self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+from weakref import WeakSet
+
+from mcp.server.session import ServerSession
+from pydantic import AnyUrl
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentNotifier:
+    """Sends resource notifications about store changes to client sessions.
+
+    Sessions subscribed to a document's URI get `notifications/resources/updated`
+    when it is edited, replaced or deleted. Sessions that have listed or
+    subscribed to resources get `notifications/resources/list_changed` when
+    documents are added or deleted. Changes may come from any thread; they are
+    handed to the event loop and sent in batches after `delay` seconds, so a
+    burst of ingested files produces one notification per session and URI.
+    """
+
+    def __init__(self, uri_for: Callable[[str], str], delay: float = 0.1):
+        self.uri_for = uri_for
+        self.delay = delay
+        self._sessions: WeakSet[ServerSession] = WeakSet()
+        self._subscriptions: dict[str, WeakSet[ServerSession]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._updated: set[str] = set()
+        self._list_changed = False
+        self._flush: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def track(self, session: ServerSession):
+        self._sessions.add(session)
+
+    def subscribe(self, uri: str, session: ServerSession):
+        self.track(session)
+        self._subscriptions.setdefault(uri, WeakSet()).add(session)
+
+    def unsubscribe(self, uri: str, session: ServerSession):
+        sessions = self._subscriptions.get(uri)
+        if sessions is not None:
+            sessions.discard(session)
+            if not sessions:
+                del self._subscriptions[uri]
+
+    def on_change(self, event: str, doc_id: str):
+        """A DocumentStore listener."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._queue, event, doc_id)
+
+    def _queue(self, event: str, doc_id: str):
+        if event != "added":
+            self._updated.add(self.uri_for(doc_id))
+        if event != "updated":
+            self._list_changed = True
+        if self._flush is None:
+            self._flush = self._loop.call_later(self.delay, self._send_pending)
+
+    def _send_pending(self):
+        self._flush = None
+        updated, self._updated = self._updated, set()
+        list_changed, self._list_changed = self._list_changed, False
+
+        sends = [
+            self._send(session, session.send_resource_updated(AnyUrl(uri)))
+            for uri in updated
+            for session in list(self._subscriptions.get(uri, ()))
+        ]
+        if list_changed:
+            sends += [
+                self._send(session, session.send_resource_list_changed())
+                for session in list(self._sessions)
+            ]
+        for send in sends:
+            task = self._loop.create_task(send)
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, session: ServerSession, notification: Awaitable[None]):
+        try:
+            await notification
+        except Exception as error:
+            # The client has gone away; stop notifying it.
+            logger.debug("Dropping session after failed notification: %s", error)
+            self._sessions.discard(session)
+            for uri in list(self._subscriptions):
+                self.unsubscribe(uri, session)
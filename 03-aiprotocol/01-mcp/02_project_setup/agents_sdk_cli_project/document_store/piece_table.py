@@ -0,0 +1,122 @@
+import bisect
+from array import array
+from dataclasses import dataclass
+from itertools import accumulate
+
+from document_store.text_source import MappedFileSource, StringSource, TextSource
+
+
+@dataclass(frozen=True)
+class Piece:
+    """A span of one buffer, with the number of newlines it contains."""
+
+    source: TextSource
+    start: int
+    length: int
+    newlines: int
+
+
+def _piece(source: TextSource, start: int, length: int) -> Piece:
+    offsets = source.newline_offsets()
+    newlines = bisect.bisect_left(offsets, start + length) - bisect.bisect_left(offsets, start)
+    return Piece(source, start, length, newlines)
+
+
+class PieceTable(TextSource):
+    """An immutable piece table over read-only text buffers.
+
+    The text is a sequence of pieces, each pointing into either the original
+    buffer or the buffer holding one inserted string. `splice` returns a new
+    table that shares every untouched piece with this one, so an edit costs
+    O(log pieces) lookups plus a copy of the piece list, never a copy of the
+    text. Old tables stay valid, which lets readers keep a consistent
+    snapshot while edits are applied.
+    """
+
+    def __init__(self, pieces: tuple[Piece, ...] = ()):
+        self.pieces = pieces
+        self._ends = list(accumulate(piece.length for piece in pieces))
+        self._newline_ends = list(accumulate(piece.newlines for piece in pieces))
+        self._newlines: array | None = None
+        for source in {piece.source for piece in pieces if isinstance(piece.source, MappedFileSource)}:
+            source.retain(self)
+
+    @classmethod
+    def from_source(cls, source: TextSource) -> "PieceTable":
+        return cls((_piece(source, 0, len(source)),) if len(source) else ())
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def slice(self, start: int, end: int) -> str:
+        return "".join(
+            piece.source.slice(piece.start, piece.start + piece.length)
+            for piece in self._pieces_between(max(0, start), min(end, len(self)))
+        )
+
+    def newline_count(self) -> int:
+        return self._newline_ends[-1] if self._newline_ends else 0
+
+    def newline_at(self, index: int) -> int:
+        if index < 0:
+            index += self.newline_count()
+        piece_index = bisect.bisect_right(self._newline_ends, index)
+        piece = self.pieces[piece_index]
+        before = self._newline_ends[piece_index] - piece.newlines
+        offsets = piece.source.newline_offsets()
+        first = bisect.bisect_left(offsets, piece.start)
+        piece_start = self._ends[piece_index] - piece.length
+        return offsets[first + index - before] - piece.start + piece_start
+
+    def newline_offsets(self) -> array:
+        if self._newlines is None:
+            self._newlines = array("q", (self.newline_at(i) for i in range(self.newline_count())))
+        return self._newlines
+
+    def splice(self, start: int, delete: int, insert: str = "") -> "PieceTable":
+        """Returns a new table with `delete` characters at start replaced by insert."""
+        return self.splice_many([(start, delete, insert)])
+
+    def splice_many(self, edits: list[tuple[int, int, str]]) -> "PieceTable":
+        """Applies (start, delete, insert) edits given in ascending, non-overlapping order.
+
+        Offsets refer to this table, before any of the edits.
+        """
+        pieces: list[Piece] = []
+        position = 0
+        for start, delete, insert in edits:
+            if start < position or delete < 0 or start + delete > len(self):
+                raise ValueError(
+                    f"Edit range {start}..{start + delete} is out of order or outside 0..{len(self)}"
+                )
+            pieces.extend(self._pieces_between(position, start))
+            if insert:
+                pieces.append(_piece(StringSource(insert), 0, len(insert)))
+            position = start + delete
+        pieces.extend(self._pieces_between(position, len(self)))
+        return PieceTable(tuple(pieces))
+
+    def compacted(self) -> "PieceTable":
+        """Returns an equivalent table backed by a single buffer."""
+        return PieceTable.from_source(StringSource(self.text()))
+
+    def _pieces_between(self, start: int, end: int) -> list[Piece]:
+        """The pieces covering [start, end), with the first and last trimmed to fit."""
+        if start >= end:
+            return []
+        first = bisect.bisect_right(self._ends, start)
+        last = bisect.bisect_left(self._ends, end)
+        if first == last:
+            return [self._trimmed(first, start, end)]
+        return [
+            self._trimmed(first, start, self._ends[first]),
+            *self.pieces[first + 1:last],
+            self._trimmed(last, self._ends[last - 1], end),
+        ]
+
+    def _trimmed(self, index: int, start: int, end: int) -> Piece:
+        piece = self.pieces[index]
+        piece_start = self._ends[index] - piece.length
+        if start == piece_start and end == self._ends[index]:
+            return piece
+        return _piece(piece.source, piece.start + start - piece_start, end - start)
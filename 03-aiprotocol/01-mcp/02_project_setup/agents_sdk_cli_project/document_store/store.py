@@ -0,0 +1,514 @@
+import bisect
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from document_store.backend import Change, Steps, StorageBackend, apply_steps
+from document_store.document import Document, Snapshot, VersionConflictError
+from document_store.index import InvertedIndex
+from document_store.piece_table import PieceTable
+from document_store.text_source import MappedFileSource, StringSource, TextSource
+
+
+ChangeListener = Callable[[str, str], None]
+"""Called with ("added" | "updated" | "deleted", doc_id) after a document changes."""
+
+
+class DocumentNotFoundError(ValueError):
+    def __init__(self, doc_id: str):
+        super().__init__(f"Doc with id {doc_id} not found")
+        self.doc_id = doc_id
+
+
+class EditError(ValueError):
+    """A replacement in a batch could not be applied, so the batch was not."""
+
+    def __init__(self, index: int, message: str):
+        super().__init__(message)
+        self.index = index
+
+
+@dataclass
+class Replacement:
+    old_str: str
+    new_str: str
+    replace_all: bool = False
+
+
+@dataclass
+class SearchResult:
+    doc_id: str
+    score: float
+    snippet: str
+
+
+@dataclass
+class Chunk:
+    doc_id: str
+    text: str
+    offset: int
+    next_offset: int | None
+    """Where the next chunk starts, or None once the document is exhausted."""
+    total_length: int
+    version: int
+
+
+class DocumentStore:
+    """Holds the server's documents together with a full-text search index.
+
+    Documents are versioned piece tables over text sources, so ranges of
+    file-backed documents are read from a memory map without loading the rest
+    of the file, and an edit never copies the document. Edited documents are
+    re-indexed one at a time, on the next search.
+
+    With a `backend`, the documents live there and may be shared with other
+    processes; this store then caches the `max_cached` it used last. Every call first
+    compares the backend's generation counter with the last one seen and, if
+    other processes have written since, catches up: edits are applied to the
+    cached copies they were made against, and any other changed document is
+    dropped from the cache, to be reloaded when next needed. Writes go to the
+    backend first, checked against the version they were based on; edits are
+    sent as the splices that make them, not as the whole text.
+    `documents` are then only added if the backend does not have them yet.
+    """
+
+    def __init__(
+        self,
+        documents: dict[str, str] | None = None,
+        backend: StorageBackend | None = None,
+        max_cached: int = 1024,
+    ):
+        self.backend = backend
+        self.max_cached = max_cached
+        # Least recently used first; only bounded when the backend holds the documents.
+        self._docs: OrderedDict[str, Document] = OrderedDict()
+        self._lock = threading.RLock()
+        self._unindexed: set[str] = set()
+        # Kept sorted so listings can be paged by the last id seen.
+        self._sorted_ids: list[str] = []
+        self._listeners: list[ChangeListener] = []
+        self.index = InvertedIndex()
+        self._generation = 0
+        # Generations of this store's own writes, which need no invalidation.
+        self._own_generations: set[int] = set()
+        if backend is not None:
+            self._generation = backend.generation()
+            self._sorted_ids = backend.ids()
+            self._unindexed = set(self._sorted_ids)
+        for doc_id, text in (documents or {}).items():
+            if backend is None:
+                self.put(doc_id, text)
+            else:
+                self._put_source(doc_id, StringSource(text), only_if_absent=True)
+
+    def __contains__(self, doc_id: str) -> bool:
+        self._sync()
+        return self._id_position(doc_id) is not None
+
+    def __len__(self) -> int:
+        self._sync()
+        return len(self._sorted_ids)
+
+    def _id_position(self, doc_id: str) -> int | None:
+        position = bisect.bisect_left(self._sorted_ids, doc_id)
+        if position < len(self._sorted_ids) and self._sorted_ids[position] == doc_id:
+            return position
+        return None
+
+    def _sync(self):
+        """Applies changes other processes made to the backend since the last call."""
+        if self.backend is None or self.backend.generation() == self._generation:
+            return
+        with self._lock:
+            generation, changes = self.backend.changes_since(self._generation)
+            if changes is None:
+                # Too far behind to catch up from the log: start afresh.
+                changes = []
+                for doc_id in list(self._docs):
+                    self._drop(doc_id)
+                self.index = InvertedIndex()
+                self._sorted_ids = self.backend.ids()
+                self._unindexed = set(self._sorted_ids)
+            else:
+                first = self._generation + 1
+                changes = [
+                    change
+                    for number, change in enumerate(changes, first)
+                    if number not in self._own_generations
+                ]
+            for change in changes:
+                doc_id, event = change.doc_id, change.event
+                if not self._caught_up(change):
+                    self._drop(doc_id)
+                position = self._id_position(doc_id)
+                if event == "deleted":
+                    if position is not None:
+                        del self._sorted_ids[position]
+                    self._unindexed.discard(doc_id)
+                    self.index.remove(doc_id)
+                else:
+                    if position is None:
+                        bisect.insort(self._sorted_ids, doc_id)
+                    self._unindexed.add(doc_id)
+            self._generation = generation
+            self._own_generations = {number for number in self._own_generations if number > generation}
+        for change in changes:
+            self._notify(change.event, change.doc_id)
+
+    def _caught_up(self, change: Change) -> bool:
+        """Applies another process's edit to the cached document, if it holds the version before."""
+        document = self._docs.get(change.doc_id)
+        if document is None or change.steps is None or document.version != change.version - 1:
+            return False
+        try:
+            document.commit(apply_steps(document.snapshot.text, change.steps), change.version - 1)
+        except ValueError:
+            return False
+        return True
+
+    def _drop(self, doc_id: str):
+        """Removes a document from the cache, closing the files it maps."""
+        document = self._docs.pop(doc_id, None)
+        if document is not None:
+            document.close()
+
+    def _remember(self, document: Document):
+        """Caches a document, evicting the least recently used beyond max_cached."""
+        self._docs[document.doc_id] = document
+        self._docs.move_to_end(document.doc_id)
+        if self.backend is not None:
+            while len(self._docs) > self.max_cached:
+                self._drop(next(iter(self._docs)))
+
+    def _written(self, generation: int):
+        """Records a generation of this store's own writes."""
+        with self._lock:
+            if generation > self._generation:
+                self._own_generations.add(generation)
+
+    def ids(self) -> list[str]:
+        self._sync()
+        with self._lock:
+            return list(self._sorted_ids)
+
+    def list_ids(
+        self, prefix: str = "", after: str | None = None, limit: int = 500
+    ) -> tuple[list[str], bool]:
+        """Returns up to limit ids starting with prefix that sort after `after`.
+
+        The flag tells whether more matching ids follow the returned ones.
+        """
+        self._sync()
+        with self._lock:
+            start = bisect.bisect_left(self._sorted_ids, prefix)
+            if after is not None:
+                start = max(start, bisect.bisect_right(self._sorted_ids, after))
+            page = []
+            for doc_id in self._sorted_ids[start:start + limit + 1]:
+                if not doc_id.startswith(prefix):
+                    break
+                page.append(doc_id)
+            return page[:limit], len(page) > limit
+
+    def document(self, doc_id: str) -> Document:
+        self._sync()
+        return self._cached(doc_id)
+
+    def _cached(self, doc_id: str) -> Document:
+        document = self._docs.get(doc_id)
+        if document is not None:
+            if self.backend is not None:
+                with self._lock:
+                    if self._docs.get(doc_id) is document:
+                        self._docs.move_to_end(doc_id)
+            return document
+        if self.backend is None or (stored := self.backend.load(doc_id)) is None:
+            raise DocumentNotFoundError(doc_id)
+        text, version = stored
+        with self._lock:
+            # Another thread may have loaded it, or a newer version, meanwhile.
+            document = self._docs.get(doc_id)
+            if document is None or document.version < version:
+                self._drop(doc_id)
+                document = Document(doc_id, StringSource(text), version=version)
+                self._remember(document)
+            return document
+
+    def snapshot(self, doc_id: str) -> Snapshot:
+        return self.document(doc_id).snapshot
+
+    def source(self, doc_id: str) -> TextSource:
+        return self.snapshot(doc_id).text
+
+    def version(self, doc_id: str) -> int:
+        return self.document(doc_id).version
+
+    def get(self, doc_id: str) -> str:
+        return self.source(doc_id).text()
+
+    def read(self, doc_id: str, offset: int = 0, length: int | None = None) -> str:
+        source = self.source(doc_id)
+        end = len(source) if length is None else offset + length
+        return source.slice(offset, end)
+
+    def read_lines(self, doc_id: str, start_line: int = 1, end_line: int | None = None) -> str:
+        """Returns lines start_line..end_line, 1-based and inclusive."""
+        source = self.source(doc_id)
+        if end_line is None:
+            end_line = max(start_line, source.line_count())
+        return source.slice(*source.line_span(start_line, end_line))
+
+    def read_chunk(
+        self,
+        doc_id: str,
+        offset: int = 0,
+        chunk_size: int = 8000,
+        expected_version: int | None = None,
+    ) -> Chunk:
+        """Returns up to chunk_size characters from offset.
+
+        A chunk ends after the last line break in its second half when there
+        is one, so lines are not split across chunks unless they are long.
+        With expected_version, raises VersionConflictError if the document has
+        moved on, as the offset then no longer points where it did.
+        """
+        snapshot = self.snapshot(doc_id)
+        if expected_version is not None and snapshot.version != expected_version:
+            raise VersionConflictError(doc_id, expected_version, snapshot.version)
+        source = snapshot.text
+        total = len(source)
+        text = source.slice(offset, offset + chunk_size)
+        end = offset + len(text)
+        if end < total:
+            line_end = text.rfind("\n", len(text) // 2)
+            if line_end >= 0:
+                text = text[:line_end + 1]
+                end = offset + len(text)
+        return Chunk(
+            doc_id=doc_id,
+            text=text,
+            offset=offset,
+            next_offset=end if end < total else None,
+            total_length=total,
+            version=snapshot.version,
+        )
+
+    def put(self, doc_id: str, text: str):
+        self._put_source(doc_id, StringSource(text))
+
+    def put_file(self, doc_id: str, path: str | Path):
+        """Adds a UTF-8 file as a document served through a memory map."""
+        self._put_source(doc_id, MappedFileSource(path))
+
+    def add_listener(self, listener: ChangeListener):
+        """Registers a callback for document changes.
+
+        Listeners run on the thread that made the change, so they should only
+        hand the event off.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, event: str, doc_id: str):
+        for listener in self._listeners:
+            listener(event, doc_id)
+
+    def _put_source(self, doc_id: str, source: TextSource, only_if_absent: bool = False):
+        if self.backend is not None:
+            self._sync()
+        # Held from the backend write on, so no _sync in between mistakes
+        # this store's own change for another process's.
+        with self._lock:
+            if self.backend is not None:
+                stored = self.backend.put(doc_id, source.text(), only_if_absent)
+                if stored is None:
+                    return
+                version, generation = stored
+                self._written(generation)
+            document = self._docs.get(doc_id)
+            event = "added" if self._id_position(doc_id) is None else "updated"
+            if event == "added":
+                bisect.insort(self._sorted_ids, doc_id)
+            if self.backend is not None:
+                self._drop(doc_id)
+                self._remember(Document(doc_id, source, version=version))
+            elif document is None:
+                self._docs[doc_id] = Document(doc_id, source)
+            else:
+                # Keep the version history increasing across a reload.
+                document.commit(PieceTable.from_source(source))
+            self._unindexed.discard(doc_id)
+            self.index.add(doc_id, source.text())
+        self._notify(event, doc_id)
+
+    def delete(self, doc_id: str):
+        if self.backend is not None:
+            self._sync()
+        with self._lock:
+            if self.backend is not None:
+                generation = self.backend.delete(doc_id)
+                if generation is None:
+                    raise DocumentNotFoundError(doc_id)
+                self._written(generation)
+            position = self._id_position(doc_id)
+            if position is None:
+                raise DocumentNotFoundError(doc_id)
+            del self._sorted_ids[position]
+            self._drop(doc_id)
+            self._unindexed.discard(doc_id)
+            self.index.remove(doc_id)
+        self._notify("deleted", doc_id)
+
+    def edit(
+        self,
+        doc_id: str,
+        offset: int,
+        delete: int,
+        insert: str = "",
+        expected_version: int | None = None,
+    ) -> int:
+        """Replaces `delete` characters at offset with insert and returns the new version.
+
+        Offsets refer to the expected version, or to the current one when no
+        version is given; either way the edit fails with VersionConflictError
+        if another edit lands first.
+        """
+        document = self.document(doc_id)
+        snapshot = document.snapshot
+        if expected_version is not None and snapshot.version != expected_version:
+            raise VersionConflictError(doc_id, expected_version, snapshot.version)
+        steps = [[(offset, delete, insert)]]
+        text = apply_steps(snapshot.text, steps)
+        return self._commit(document, text, snapshot.version, steps).version
+
+    def replace(
+        self,
+        doc_id: str,
+        old_str: str,
+        new_str: str,
+        expected_version: int | None = None,
+        replace_all: bool = False,
+    ) -> int:
+        """Replaces old_str with new_str and returns the new version.
+
+        old_str must occur exactly once unless replace_all is set.
+        """
+        return self.replace_many(doc_id, [Replacement(old_str, new_str, replace_all)], expected_version)
+
+    def replace_many(
+        self,
+        doc_id: str,
+        replacements: list[Replacement],
+        expected_version: int | None = None,
+    ) -> int:
+        """Applies replacements in order as one edit and returns the new version.
+
+        Either every replacement is applied or none is; a failing one raises
+        EditError carrying its index. Without an expected version, a batch
+        that loses a race is matched again against the newer text.
+        """
+        while True:
+            document = self.document(doc_id)
+            snapshot = document.snapshot
+            if expected_version is not None and snapshot.version != expected_version:
+                raise VersionConflictError(doc_id, expected_version, snapshot.version)
+            text = snapshot.text
+            steps: Steps = []
+            for index, replacement in enumerate(replacements):
+                try:
+                    edits = self._replacement_edits(text, doc_id, replacement)
+                except ValueError as error:
+                    raise EditError(index, str(error)) from None
+                text = text.splice_many(edits)
+                steps.append(edits)
+            try:
+                return self._commit(document, text, snapshot.version, steps).version
+            except VersionConflictError:
+                if expected_version is not None:
+                    raise
+
+    def _replacement_edits(
+        self, text: PieceTable, doc_id: str, replacement: Replacement
+    ) -> list[tuple[int, int, str]]:
+        old_str = replacement.old_str
+        if not old_str:
+            raise ValueError("The text to replace must not be empty")
+        positions = self._occurrences(text, old_str, replacement.replace_all)
+        if not positions:
+            raise ValueError(f"Text to replace not found in doc {doc_id}")
+        if len(positions) > 1 and not replacement.replace_all:
+            raise ValueError(
+                f"Text to replace occurs more than once in doc {doc_id}; "
+                "include more surrounding text or replace all occurrences"
+            )
+        return [(position, len(old_str), replacement.new_str) for position in positions]
+
+    def _commit(self, document: Document, text: PieceTable, base_version: int, steps: Steps) -> Snapshot:
+        """Publishes text, made from base_version by steps, as the document's next version."""
+        # The lock spans the backend write, recording its generation as this
+        # store's own, and the local commit. A _sync in between would apply
+        # the change a second time, to the cached document.
+        with self._lock:
+            if self.backend is not None:
+                try:
+                    _, generation = self.backend.save(document.doc_id, steps, base_version)
+                except VersionConflictError:
+                    # Another process wrote first; reload the document next time.
+                    if self._docs.get(document.doc_id) is document:
+                        self._drop(document.doc_id)
+                    raise
+                except KeyError:
+                    raise DocumentNotFoundError(document.doc_id) from None
+                self._written(generation)
+            snapshot = document.commit(text, base_version)
+            self._unindexed.add(document.doc_id)
+        self._notify("updated", document.doc_id)
+        return snapshot
+
+    @staticmethod
+    def _occurrences(text: TextSource, sub: str, find_all: bool) -> list[int]:
+        positions = []
+        position = text.find(sub)
+        # Without find_all, a second match is enough to reject the edit.
+        while position >= 0 and (find_all or len(positions) < 2):
+            positions.append(position)
+            position = text.find(sub, position + len(sub))
+        return positions
+
+    def search(self, query: str, limit: int = 10, snippet_chars: int = 160) -> list[SearchResult]:
+        self._sync()
+        with self._lock:
+            for doc_id in self._unindexed:
+                text = self._current_text(doc_id)
+                if text is not None:
+                    self.index.add(doc_id, text)
+            self._unindexed.clear()
+            return [
+                SearchResult(
+                    doc_id=hit.doc_id,
+                    score=round(hit.score, 4),
+                    snippet=self._snippet(hit.doc_id, hit.offsets[0], snippet_chars),
+                )
+                for hit in self.index.search(query, limit)
+            ]
+
+    def _current_text(self, doc_id: str) -> str | None:
+        """The document's text, read from the backend rather than cached if it is not already."""
+        document = self._docs.get(doc_id)
+        if document is not None:
+            return document.snapshot.text.text()
+        if self.backend is None or (stored := self.backend.load(doc_id)) is None:
+            return None
+        return stored[0]
+
+    def _snippet(self, doc_id: str, offset: int, snippet_chars: int) -> str:
+        source = self._cached(doc_id).snapshot.text
+        start = max(0, offset - snippet_chars // 2)
+        end = min(len(source), start + snippet_chars)
+        snippet = " ".join(source.slice(start, end).split())
+        if start > 0:
+            snippet = "..." + snippet
+        if end < len(source):
+            snippet += "..."
+        return snippet
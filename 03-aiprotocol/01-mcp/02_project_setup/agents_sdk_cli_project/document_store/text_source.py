@@ -0,0 +1,211 @@
+import bisect
+import codecs
+import mmap
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from array import array
+from pathlib import Path
+
+
+class TextSource(ABC):
+    """Read-only text addressed by character offsets and by lines."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """The length of the text in characters."""
+
+    @abstractmethod
+    def slice(self, start: int, end: int) -> str:
+        """Returns the characters in [start, end)."""
+
+    @abstractmethod
+    def newline_offsets(self) -> array:
+        """Character offsets of every "\\n", in ascending order."""
+
+    def text(self) -> str:
+        return self.slice(0, len(self))
+
+    def newline_count(self) -> int:
+        return len(self.newline_offsets())
+
+    def newline_at(self, index: int) -> int:
+        """The character offset of the index-th "\\n" (0-based)."""
+        return self.newline_offsets()[index]
+
+    def find(self, sub: str, start: int = 0, window: int = 1 << 20) -> int:
+        """Returns the offset of the first `sub` at or after start, or -1.
+
+        The text is scanned in overlapping windows, so at most one window is
+        decoded at a time.
+        """
+        length = len(self)
+        overlap = len(sub) - 1
+        while start + len(sub) <= length:
+            found = self.slice(start, start + window + overlap).find(sub)
+            if found >= 0:
+                return start + found
+            start += window
+        return -1
+
+    def line_count(self) -> int:
+        length = len(self)
+        if length == 0:
+            return 0
+        count = self.newline_count()
+        # A trailing newline does not start another line.
+        trailing = 1 if count and self.newline_at(count - 1) == length - 1 else 0
+        return count + 1 - trailing
+
+    def line_span(self, start_line: int, end_line: int) -> tuple[int, int]:
+        """Returns the character span of lines start_line..end_line (1-based, inclusive)."""
+        length = len(self)
+        count = self.newline_count()
+        if start_line <= 1:
+            start = 0
+        elif start_line - 2 < count:
+            start = self.newline_at(start_line - 2) + 1
+        else:
+            start = length
+        if end_line - 1 < count:
+            end = self.newline_at(end_line - 1) + 1
+        else:
+            end = length
+        return start, max(start, end)
+
+
+class StringSource(TextSource):
+    def __init__(self, text: str):
+        self._text = text
+        self._newlines: array | None = None
+
+    def __len__(self) -> int:
+        return len(self._text)
+
+    def slice(self, start: int, end: int) -> str:
+        return self._text[start:end]
+
+    def text(self) -> str:
+        return self._text
+
+    def find(self, sub: str, start: int = 0, window: int = 1 << 20) -> int:
+        return self._text.find(sub, start)
+
+    def newline_offsets(self) -> array:
+        if self._newlines is None:
+            newlines = array("q")
+            position = self._text.find("\n")
+            while position >= 0:
+                newlines.append(position)
+                position = self._text.find("\n", position + 1)
+            self._newlines = newlines
+        return self._newlines
+
+
+class MappedFileSource(TextSource):
+    """A UTF-8 file served through mmap, so slices never load the whole file.
+
+    One pass over the file records a (character, byte) checkpoint every
+    `block_size` bytes and the offset of every newline. A slice then decodes
+    from the nearest checkpoint onwards only.
+
+    Every piece table built over the file `retain`s it. `close` unmaps the
+    file once the last of those tables is garbage collected, so readers
+    holding an older snapshot keep reading it until they let go.
+    """
+
+    def __init__(self, path: str | Path, block_size: int = 64 * 1024):
+        self.path = Path(path)
+        self.block_size = block_size
+        with open(self.path, "rb") as file:
+            # An empty file cannot be mapped; an empty buffer reads the same.
+            size = os.fstat(file.fileno()).st_size
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._lock = threading.Lock()
+        self._users = 0
+        self._closing = False
+        self._closed = False
+        self._char_checkpoints = array("q")
+        self._byte_checkpoints = array("q")
+        self._newlines = array("q")
+        self._length = self._scan()
+
+    def __len__(self) -> int:
+        return self._length
+
+    def newline_offsets(self) -> array:
+        return self._newlines
+
+    def slice(self, start: int, end: int) -> str:
+        start = max(0, start)
+        end = min(end, self._length)
+        if start >= end:
+            return ""
+        if self._closed:
+            raise ValueError(f"{self.path} is closed")
+        checkpoint = bisect.bisect_right(self._char_checkpoints, start) - 1
+        char_position = self._char_checkpoints[checkpoint]
+        byte_position = self._byte_checkpoints[checkpoint]
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        parts = []
+        while char_position < end and byte_position < len(self._map):
+            block = self._map[byte_position:byte_position + self.block_size]
+            byte_position += len(block)
+            text = decoder.decode(block, final=byte_position >= len(self._map))
+            block_start = char_position
+            char_position += len(text)
+            if char_position > start:
+                parts.append(text[max(0, start - block_start):end - block_start])
+        return "".join(parts)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def retain(self, owner: object):
+        """Keeps the file mapped for as long as owner is alive."""
+        with self._lock:
+            self._users += 1
+        weakref.finalize(owner, self._release)
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            if not self._users:
+                self._unmap()
+
+    def _release(self):
+        with self._lock:
+            self._users -= 1
+            if self._closing and not self._users:
+                self._unmap()
+
+    def _unmap(self):
+        self._closed = True
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def _scan(self) -> int:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        char_position = 0
+        byte_position = 0
+        size = len(self._map)
+        while byte_position < size or byte_position == 0:
+            # The bytes held back by the decoder belong to the next block.
+            pending = len(decoder.getstate()[0])
+            self._char_checkpoints.append(char_position)
+            self._byte_checkpoints.append(byte_position - pending)
+            if byte_position >= size:
+                break
+
+            block = self._map[byte_position:byte_position + self.block_size]
+            byte_position += len(block)
+            text = decoder.decode(block, final=byte_position >= size)
+            position = text.find("\n")
+            while position >= 0:
+                self._newlines.append(char_position + position)
+                position = text.find("\n", position + 1)
+            char_position += len(text)
+        return char_position
@@ -4,8 +4,9 @@ import os
 from dotenv import load_dotenv, find_dotenv
 from contextlib import AsyncExitStack
 
-from mcp_client import MCPClient
+from mcp_client import MCPClient, fan_out
 from core.agent_service import AgentService
+from core.context_window import ContextWindow
 
 from core.cli_chat import CliChat
 from core.cli import CliApp
@@ -17,6 +18,17 @@ llm_model = os.getenv("LLM_MODEL", "")
 llm_api_key = os.getenv("LLM_MODEL_API_KEY", "")
 llm_base_url = os.getenv("LLM_CHAT_COMPLETION_URL", "")
 
+# CLI Config
+cli_streaming = os.getenv("CLI_STREAMING", "false").lower() in ("1", "true", "yes")
+
+# Document server: a streamable HTTP URL, or "inprocess" to run mcp_server.py
+# inside this process without any transport framing.
+doc_server = os.getenv("DOC_SERVER", "http://localhost:8000/mcp/")
+
+# Context Config
+context_token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "32000"))
+tool_output_token_limit = int(os.getenv("TOOL_OUTPUT_TOKEN_LIMIT", "2000"))
+
 assert llm_model, "Error: LLM_MODEL cannot be empty. Update .env"
 assert llm_api_key, (
     "Error: LLM_API_KEY cannot be empty. Update .env"
@@ -30,36 +42,53 @@ async def main():
     server_scripts = sys.argv[1:]
     clients = {}
 
-    # command, args = ("uv", ["run", "mcp_server.py"])
-    server_url = "http://localhost:8000/mcp/"
-
     async with AsyncExitStack() as stack:
-        doc_client = await stack.enter_async_context(
-            MCPClient(server_url=server_url)
-        )
-        clients["doc_client"] = doc_client
+        if doc_server == "inprocess":
+            import mcp_server
 
+            await stack.enter_async_context(mcp_server.background_services())
+            clients["doc_client"] = MCPClient(server=mcp_server.mcp)
+        else:
+            clients["doc_client"] = MCPClient(server_url=doc_server)
+        # Each script runs as a stdio subprocess that is restarted if it crashes.
         for i, server_script in enumerate(server_scripts):
             client_id = f"client_{i}_{server_script}"
-            client = await stack.enter_async_context(
-                MCPClient(command="uv", args=["run", server_script])
-            )
-            clients[client_id] = client
+            clients[client_id] = MCPClient(command="uv", args=["run", server_script])
+
+        # Connect to all servers at once, which also starts every subprocess in
+        # parallel; a server that is down or slow only costs its own timeout
+        # and is left out of the session.
+        connected = await fan_out(clients, stack.enter_async_context)
+        for client_id, error in connected.errors.items():
+            if client_id == "doc_client":
+                raise ConnectionError(f"Could not connect to {doc_server}") from error
+            print(f"Skipping degraded server {client_id}: {error!r}")
+            del clients[client_id]
+        doc_client = clients["doc_client"]
 
         agent_service = AgentService(
             model=llm_model,
             api_key=llm_api_key,
             base_url=llm_base_url,
-            clients=clients
+            clients=clients,
+            context_window=ContextWindow(
+                max_tokens=context_token_budget,
+                max_tool_output_tokens=tool_output_token_limit,
+            ),
         )
 
+        # List every server's tools in the background so the first turn
+        # does not wait for them.
+        warm_catalog = asyncio.create_task(agent_service.tool_catalog.get_entries())
+        stack.callback(warm_catalog.cancel)
+
         chat = CliChat(
             doc_client=doc_client,
             clients=clients,
             agent_serve=agent_service,
         )
 
-        cli = CliApp(chat)
+        cli = CliApp(chat, streaming=cli_streaming)
         await cli.initialize()
         await cli.run()
 
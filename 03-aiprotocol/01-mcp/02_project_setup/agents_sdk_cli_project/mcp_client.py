@@ -1,62 +1,245 @@
 import sys
+import json
+import random
 import asyncio
-from typing import Optional, Any
-from contextlib import AsyncExitStack
-from mcp import ClientSession, types
+from dataclasses import dataclass, field
+from typing import Optional, Any, AsyncIterator, Awaitable, Callable, Generic, TypeVar
+from contextlib import AsyncExitStack, asynccontextmanager
+import anyio
+from mcp import ClientSession, McpError, StdioServerParameters, types
+from mcp.client.stdio import stdio_client
 from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.memory import create_client_server_memory_streams
+from pydantic import AnyUrl
+
+T = TypeVar("T")
+
+NotificationHandler = Callable[[types.ServerNotification], Awaitable[None]]
+
+# The error the streamable HTTP transport reports when the server no longer
+# knows our session id, e.g. after a restart.
+_SESSION_TERMINATED = 32600
+
+
+class _NotSentError(ConnectionError):
+    """The session was closed before the request could be written, so it is safe to resend."""
 
 
 class MCPClient:
+    """A connection to one MCP server over one of three transports.
+
+    - `server_url`: streamable HTTP. When the server is stateless (it gives
+      out no session id), up to `pool_size` sessions are opened and each
+      request goes to the least busy one.
+    - `command` (with `args` and `env`): a server subprocess over stdio.
+    - `server`: a FastMCP (or low-level) server running in this process,
+      connected through in-memory streams, with no framing or sockets.
+
+    A session whose transport breaks (the server restarts, the subprocess
+    dies, the HTTP stream drops) is reopened with exponential backoff and
+    jitter, up to `max_reconnects` times in a row (None for no limit) unless
+    `reconnect` is False. Requests made meanwhile wait up to `timeout` for a
+    session. A request lost with its session is sent again on the new one
+    if it is idempotent: listings, reads, and tools annotated read-only or
+    idempotent. Other tool calls fail with ConnectionError, as they may or
+    may not have taken effect.
+    """
+
     def __init__(
         self,
-        server_url: str,
+        server_url: str | None = None,
+        timeout: float = 10.0,
+        max_concurrent_calls: int = 8,
+        command: str | None = None,
+        args: list[str] | None = None,
+        env: dict[str, str] | None = None,
+        server: Any = None,
+        reconnect: bool = True,
+        max_reconnects: int | None = None,
+        pool_size: int = 4,
+        max_replays: int = 2,
     ):
+        if sum(option is not None for option in (server_url, command, server)) != 1:
+            raise ValueError("Pass exactly one of server_url, command or server")
         self._server_url = server_url
-        self._session: Optional[ClientSession] = None
-        self._exit_stack: AsyncExitStack = AsyncExitStack()
+        self._command = command
+        self._args = args or []
+        self._env = env
+        self._server = server
+        self.transport = "http" if server_url else "stdio" if command else "memory"
+        self.reconnect = reconnect
+        self.max_reconnects = max_reconnects
+        self.pool_size = pool_size
+        self.max_replays = max_replays
+        self.reconnects = 0
+        self.timeout = timeout
+        # Caps in-flight tool calls so parallel calls don't overload one server.
+        self._call_slots = asyncio.Semaphore(max_concurrent_calls)
+        self.degraded = False
+        self.last_error: BaseException | None = None
+        self.server_capabilities: Optional[types.ServerCapabilities] = None
+        self._connections: list[_Connection] = []
+        self._closing = asyncio.Event()
+        self._notification_handlers: list[NotificationHandler] = []
+        self._tool_annotations: dict[str, types.ToolAnnotations | None] = {}
+        self._subscriptions: set[str] = set()
 
     async def connect(self):
-        streamable_transport = await self._exit_stack.enter_async_context(
-            streamablehttp_client(self._server_url)
-        )
-        _read, _write, _get_session_id = streamable_transport
-        self._session = await self._exit_stack.enter_async_context(
-            ClientSession(_read, _write)
-        )
-        await self._session.initialize()
+        self._closing = asyncio.Event()
+        primary = _Connection(self, primary=True)
+        await primary.start()
+        self._connections = [primary]
+        if self.transport == "http" and primary.stateless:
+            # Any session can serve any request, so spread them over a few.
+            for _ in range(self.pool_size - 1):
+                extra = _Connection(self, primary=False)
+                extra.start_in_background()
+                self._connections.append(extra)
+
+    @asynccontextmanager
+    async def _open_transport(self):
+        """Yields (read, write, get_session_id) for a new connection to the server."""
+        if self._server is not None:
+            async with _memory_transport(self._server) as (read, write):
+                yield read, write, lambda: None
+        elif self._command is not None:
+            parameters = StdioServerParameters(command=self._command, args=self._args, env=self._env)
+            async with stdio_client(parameters) as (read, write):
+                yield read, write, lambda: None
+        else:
+            async with streamablehttp_client(self._server_url) as streams:
+                yield streams
+
+    def mark_degraded(self, error: BaseException):
+        self.degraded = True
+        self.last_error = error
+
+    def mark_healthy(self):
+        self.degraded = False
+        self.last_error = None
+
+    def add_notification_handler(self, handler: NotificationHandler):
+        """Registers a callback for notifications sent by the server."""
+        self._notification_handlers.append(handler)
+
+    async def _notify(self, notification: types.ServerNotification):
+        for handler in self._notification_handlers:
+            await handler(notification)
 
     def session(self) -> ClientSession:
-        if self._session is None:
+        primary = self._connections[0] if self._connections else None
+        if primary is None or primary.session is None:
             raise ConnectionError(
                 "Client session not initialized or cache not populated. Call connect_to_server first."
             )
-        return self._session
+        return primary.session
+
+    async def _live_connection(self) -> "_Connection":
+        """The least busy open session, waiting up to `timeout` while reconnecting."""
+        while True:
+            live = [connection for connection in self._connections if connection.live]
+            if live:
+                return min(live, key=lambda connection: connection.in_flight)
+            primary = self._connections[0] if self._connections else None
+            if primary is None or primary.stopped:
+                raise ConnectionError(
+                    f"Not connected to the {self.transport} server"
+                ) from self.last_error
+            try:
+                await asyncio.wait_for(primary.connected.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                raise ConnectionError(
+                    f"Could not reconnect to the {self.transport} server within {self.timeout}s"
+                ) from self.last_error
+
+    async def _request(
+        self, send: Callable[[ClientSession], Awaitable[T]], idempotent: bool = True
+    ) -> T:
+        replays = 0
+        while True:
+            connection = await self._live_connection()
+            try:
+                return await connection.request(send)
+            except ConnectionError as e:
+                if replays >= self.max_replays or not (idempotent or isinstance(e, _NotSentError)):
+                    raise
+                replays += 1
+
+    async def list_tools(self) -> list[types.Tool]:
+        tools: list[types.Tool] = []
+        cursor = None
+        while True:
+            result = await self._request(lambda session: session.list_tools(cursor))
+            tools.extend(result.tools)
+            cursor = result.nextCursor
+            if not cursor:
+                break
+        self._tool_annotations = {tool.name: tool.annotations for tool in tools}
+        return tools
 
-    async def list_tools(self) -> types.ListToolsResult | list[None]:
-        # TODO: Return a list of tools defined by the MCP server
-        return []
+    def _is_idempotent(self, tool_name: str) -> bool:
+        annotations = self._tool_annotations.get(tool_name)
+        return bool(annotations and (annotations.readOnlyHint or annotations.idempotentHint))
 
     async def call_tool(
         self, tool_name: str, tool_input: dict
     ) -> types.CallToolResult | None:
-        # TODO: Call a particular tool and return the result
-        return None
+        async with self._call_slots:
+            return await self._request(
+                lambda session: session.call_tool(tool_name, tool_input),
+                idempotent=self._is_idempotent(tool_name),
+            )
 
     async def list_prompts(self) -> list[types.Prompt]:
-        # TODO: Return a list of prompts defined by the MCP server
-        return []
+        result = await self._request(lambda session: session.list_prompts())
+        return result.prompts
+
+    async def get_prompt(self, prompt_name, args: dict[str, str]) -> list[types.PromptMessage]:
+        result = await self._request(lambda session: session.get_prompt(prompt_name, args))
+        return result.messages
+
+    async def iter_resource(self, uri: str) -> AsyncIterator[Any]:
+        """Yields the items of a JSON listing resource, reading one page at a time.
 
-    async def get_prompt(self, prompt_name, args: dict[str, str]):
-        # TODO: Get a particular prompt defined by the MCP server
-        return []
+        A page is {"items": [...], "next": uri}, with "next" null on the last
+        page. A resource holding a plain JSON list is treated as one page.
+        """
+        next_uri: str | None = uri
+        while next_uri:
+            page = await self.read_resource(next_uri)
+            if isinstance(page, list):
+                page = {"items": page, "next": None}
+            for item in page["items"]:
+                yield item
+            next_uri = page.get("next")
 
     async def read_resource(self, uri: str) -> Any:
-        # TODO: Read a resource, parse the contents and return it
-        return []
+        result = await self._request(lambda session: session.read_resource(AnyUrl(uri)))
+        resource = result.contents[0]
+
+        if isinstance(resource, types.TextResourceContents):
+            if resource.mimeType == "application/json":
+                return json.loads(resource.text)
+            return resource.text
+        return resource.blob
+
+    @property
+    def supports_resource_subscriptions(self) -> bool:
+        resources = self.server_capabilities and self.server_capabilities.resources
+        return bool(resources and resources.subscribe)
+
+    async def subscribe_resource(self, uri: str):
+        # Subscriptions belong to the primary session, which receives
+        # notifications, and are renewed when it reconnects.
+        await self._connections[0].request(lambda session: session.subscribe_resource(AnyUrl(uri)))
+        self._subscriptions.add(uri)
 
     async def cleanup(self):
-        await self._exit_stack.aclose()
-        self._session = None
+        self._closing.set()
+        await asyncio.gather(
+            *(connection.stop() for connection in self._connections), return_exceptions=True
+        )
+        self._connections = []
 
     async def __aenter__(self):
         await self.connect()
@@ -66,6 +249,246 @@ class MCPClient:
         await self.cleanup()
 
 
+class _Connection:
+    """One session of an MCPClient, reopened with backoff whenever its transport breaks."""
+
+    def __init__(self, client: MCPClient, primary: bool):
+        self.client = client
+        self.primary = primary
+        self.session: ClientSession | None = None
+        self.stateless = False
+        self.in_flight = 0
+        self.connected = asyncio.Event()
+        self._lost = asyncio.Event()
+        self._broken = asyncio.Event()
+        self._sessions_started = 0
+        self._runner: asyncio.Task | None = None
+
+    @property
+    def live(self) -> bool:
+        return self.session is not None and not self._broken.is_set()
+
+    def _break(self):
+        self._broken.set()
+        self.connected.clear()
+
+    @property
+    def stopped(self) -> bool:
+        return self._runner is None or self._runner.done()
+
+    async def start(self):
+        # The transport and session are entered and exited by a dedicated task,
+        # so clients can be connected concurrently and closed from any task.
+        ready = asyncio.get_running_loop().create_future()
+        self._runner = asyncio.create_task(self._run(ready))
+        try:
+            await ready
+        except BaseException:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+            raise
+
+    def start_in_background(self):
+        self._runner = asyncio.create_task(self._run(None))
+
+    async def stop(self):
+        if self._runner is not None:
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    async def _run(self, ready: asyncio.Future | None):
+        client = self.client
+        failures = 0
+        while True:
+            sessions_started = self._sessions_started
+            try:
+                await self._serve(ready)
+                return
+            except Exception as e:
+                if ready is not None and not ready.done():
+                    ready.set_exception(e)
+                    return
+                if self.primary:
+                    client.mark_degraded(e)
+                if self._sessions_started != sessions_started:
+                    failures = 0
+                if not client.reconnect or (
+                    client.max_reconnects is not None and failures >= client.max_reconnects
+                ):
+                    return
+            failures += 1
+            client.reconnects += 1
+            # Exponential backoff with jitter, so clients of a restarted
+            # server don't all reconnect at the same moment.
+            ceiling = min(0.5 * 2 ** (failures - 1), 30.0)
+            closing = asyncio.create_task(client._closing.wait())
+            try:
+                await asyncio.wait({closing}, timeout=random.uniform(ceiling / 2, ceiling))
+            finally:
+                closing.cancel()
+            if client._closing.is_set():
+                return
+
+    async def _serve(self, ready: asyncio.Future | None):
+        """Runs one session until the client closes or the transport breaks."""
+        client = self.client
+        self._lost = asyncio.Event()
+        self._broken = asyncio.Event()
+        try:
+            async with AsyncExitStack() as stack:
+                read, write, get_session_id = await stack.enter_async_context(
+                    client._open_transport()
+                )
+
+                # Relay incoming messages so the end of the stream, e.g. a
+                # crashed subprocess, is noticed even when no call is in flight.
+                relay_writer, relay_reader = anyio.create_memory_object_stream(0)
+
+                async def relay():
+                    try:
+                        async with relay_writer:
+                            async for message in read:
+                                await relay_writer.send(message)
+                    except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+                        pass
+                    finally:
+                        self._break()
+
+                relay_task = asyncio.create_task(relay())
+                stack.callback(relay_task.cancel)
+
+                session = await stack.enter_async_context(
+                    ClientSession(relay_reader, write, message_handler=self._handle_message)
+                )
+                initialize_result = await session.initialize()
+                self.stateless = get_session_id() is None
+                if self.primary:
+                    client.server_capabilities = initialize_result.capabilities
+                    for uri in client._subscriptions:
+                        await session.subscribe_resource(AnyUrl(uri))
+                    client.mark_healthy()
+                self.session = session
+                self._sessions_started += 1
+                self.connected.set()
+                if ready is not None and not ready.done():
+                    ready.set_result(None)
+
+                closing = asyncio.create_task(client._closing.wait())
+                broken = asyncio.create_task(self._broken.wait())
+                try:
+                    await asyncio.wait({closing, broken}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    closing.cancel()
+                    broken.cancel()
+                if not client._closing.is_set():
+                    raise ConnectionError(f"Lost connection to the {client.transport} server")
+        finally:
+            self.session = None
+            self.connected.clear()
+            self._lost.set()
+
+    async def _handle_message(self, message: Any):
+        if isinstance(message, types.ServerNotification):
+            if self.primary:
+                await self.client._notify(message)
+        elif isinstance(message, Exception):
+            # The transport failed to deliver a response, which would leave
+            # its request waiting forever; start over on a new session.
+            self._break()
+
+    async def request(self, send: Callable[[ClientSession], Awaitable[T]]) -> T:
+        """Sends a request on this session.
+
+        Raises ConnectionError if the session is lost before the response arrives.
+        """
+        session, lost = self.session, self._lost
+        if not self.live:
+            raise ConnectionError(f"Not connected to the {self.client.transport} server")
+        self.in_flight += 1
+        call = asyncio.ensure_future(send(session))
+        watch = asyncio.ensure_future(lost.wait())
+        try:
+            await asyncio.wait({call, watch}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.in_flight -= 1
+            watch.cancel()
+            if not call.done():
+                call.cancel()
+                # Retrieve whatever the abandoned request ends with.
+                call.add_done_callback(lambda task: task.cancelled() or task.exception())
+        if not call.done() or call.cancelled():
+            raise ConnectionError(f"Lost connection to the {self.client.transport} server")
+        try:
+            return call.result()
+        except McpError as e:
+            if e.error.code not in (types.CONNECTION_CLOSED, _SESSION_TERMINATED):
+                raise
+            self._break()
+            raise ConnectionError(f"Lost connection to the {self.client.transport} server") from e
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError) as e:
+            self._break()
+            raise _NotSentError(f"Lost connection to the {self.client.transport} server") from e
+
+
+@asynccontextmanager
+async def _memory_transport(server: Any):
+    """Runs `server` in this process, connected to the caller by memory streams."""
+    lowlevel = getattr(server, "_mcp_server", server)
+    async with create_client_server_memory_streams() as (client_streams, server_streams):
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(
+                lambda: lowlevel.run(*server_streams, lowlevel.create_initialization_options())
+            )
+            try:
+                yield client_streams
+            finally:
+                tg.cancel_scope.cancel()
+
+
+@dataclass
+class FanOutResult(Generic[T]):
+    results: dict[str, T] = field(default_factory=dict)
+    errors: dict[str, BaseException] = field(default_factory=dict)
+
+    @property
+    def degraded(self) -> list[str]:
+        return list(self.errors)
+
+
+async def fan_out(
+    clients: dict[str, MCPClient],
+    call: Callable[[MCPClient], Awaitable[T]],
+    timeout: float | None = None,
+) -> FanOutResult[T]:
+    """Runs `call` against all clients concurrently.
+
+    Each call gets its own deadline (`timeout`, or the client's own timeout).
+    Servers that fail or time out are marked degraded and reported in
+    `errors`; the results of the others are returned regardless.
+    """
+
+    async def run(name: str, client: MCPClient):
+        deadline = timeout if timeout is not None else client.timeout
+        try:
+            result = await asyncio.wait_for(call(client), deadline)
+        except Exception as e:
+            client.mark_degraded(e)
+            return name, None, e
+        client.mark_healthy()
+        return name, result, None
+
+    outcome = FanOutResult[T]()
+    for name, result, error in await asyncio.gather(
+        *(run(name, client) for name, client in clients.items())
+    ):
+        if error is None:
+            outcome.results[name] = result
+        else:
+            outcome.errors[name] = error
+    return outcome
+
+
 # For testing
 async def main():
     async with MCPClient(
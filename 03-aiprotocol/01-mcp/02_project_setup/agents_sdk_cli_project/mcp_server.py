@@ -1,7 +1,34 @@
+import asyncio
+import os
+import socket
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from urllib.parse import quote, unquote
+
 from mcp.server.fastmcp import FastMCP
-from pydantic import Field
+from mcp.server.fastmcp.prompts import base
+from mcp.server.lowlevel import NotificationOptions
+from mcp import types
+from mcp.types import ToolAnnotations
+from pydantic import AnyUrl, BaseModel, Field
+
+from document_store.backend import SqliteBackend
+from document_store.cursor import decode_cursor, encode_cursor
+from document_store.document import VersionConflictError
+from document_store.ingest import DirectoryIngestor
+from document_store.notifier import DocumentNotifier
+from document_store.store import DocumentNotFoundError, DocumentStore, EditError, Replacement
+
+# tool_execution is shared by the MCP servers in this chapter.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "shared"))
+from tool_execution import ExecutionPolicy, ToolExecutor
+
+# In stateful mode sessions outlive a request, so clients can subscribe to
+# documents and be notified when they change.
+stateful = os.getenv("MCP_STATEFUL", "false").lower() in ("1", "true", "yes")
 
-mcp = FastMCP("DocumentMCP", stateless_http=True)
+mcp = FastMCP("DocumentMCP", stateless_http=not stateful)
 
 docs = {
     "deposition.md": "This deposition covers the testimony of Angela Smith, P.E.",
@@ -12,34 +39,400 @@ docs = {
     "spec.txt": "These specifications define the technical requirements for the equipment.",
 }
 
+# With DOCS_DIR set, the documents are the supported files in that folder
+# instead of the samples above.
+docs_dir = os.getenv("DOCS_DIR")
+# With DOCS_DB set, documents are kept in that SQLite database, so several
+# worker processes (uvicorn --workers N) serve and edit the same documents.
+docs_db = os.getenv("DOCS_DB")
+backend = SqliteBackend(docs_db) if docs_db else None
+store = DocumentStore(None if docs_dir else docs, backend=backend)
+poll_interval = float(os.getenv("DOCS_POLL_INTERVAL", "5"))
+worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+def ingest_lease() -> bool:
+    # Only the worker holding the lease watches DOCS_DIR.
+    return backend.acquire_lease("ingest", worker_id, ttl=max(60.0, 3 * poll_interval))
+
+ingestor = (
+    DirectoryIngestor(
+        store,
+        docs_dir,
+        cache_dir=os.getenv("DOCS_CACHE_DIR") or None,
+        poll_interval=poll_interval,
+        lease=ingest_lease if backend else None,
+    )
+    if docs_dir
+    else None
+)
+
+def doc_uri(doc_id: str) -> str:
+    return str(AnyUrl(f"docs://documents/{quote(doc_id, safe='')}"))
 
-@mcp.tool(
+notifier = DocumentNotifier(doc_uri)
+if stateful:
+    store.add_listener(notifier.on_change)
+
+# Tools run in a thread pool so a large read, edit or search doesn't hold up
+# the other requests on the event loop. Searches scan the whole index, so
+# fewer of them may run at once.
+executor = ToolExecutor(mcp)
+READ_POLICY = ExecutionPolicy("thread", max_concurrency=8, max_queue=64)
+EDIT_POLICY = ExecutionPolicy("thread", max_concurrency=4)
+SEARCH_POLICY = ExecutionPolicy("thread", max_concurrency=2, max_queue=16)
+
+
+@executor.tool(
+    READ_POLICY,
     name="read_doc_contents",
-    description="Read the contents of a document and return it as a string."
+    description=(
+        "Read the contents of a document and return it as a string. Large documents "
+        "can be read in part, either by character offset and length or by a range "
+        "of lines (1-based, inclusive)."
+    ),
+    annotations=ToolAnnotations(readOnlyHint=True),
 )
 def read_document(
-    doc_id: str = Field(description="Id of the document to read")
+    doc_id: str = Field(description="Id of the document to read"),
+    offset: int = Field(default=0, description="Character offset to start reading at", ge=0),
+    length: int | None = Field(default=None, description="Maximum number of characters to read", ge=0),
+    start_line: int | None = Field(default=None, description="First line to read", ge=1),
+    end_line: int | None = Field(default=None, description="Last line to read", ge=1),
 ):
-    if doc_id not in docs:
-        raise ValueError(f"Doc with id {doc_id} not found")
-    return docs[doc_id]
+    if start_line is None and end_line is None:
+        return store.read(doc_id, offset, length)
+    if offset or length is not None:
+        raise ValueError("Use either offset/length or start_line/end_line, not both")
+    start_line = start_line or 1
+    if end_line is not None and end_line < start_line:
+        raise ValueError("end_line must not be before start_line")
+    return store.read_lines(doc_id, start_line, end_line)
 
-@mcp.tool(
+@executor.tool(
+    READ_POLICY,
+    name="read_doc_chunk",
+    description=(
+        "Read a document one chunk at a time. Pass the returned next_cursor to get "
+        "the following chunk; next_cursor is null after the last chunk. A cursor is "
+        "rejected once the document has been edited; start again without one."
+    ),
+    annotations=ToolAnnotations(readOnlyHint=True),
+)
+def read_doc_chunk(
+    doc_id: str = Field(description="Id of the document to read"),
+    cursor: str | None = Field(default=None, description="Cursor returned by the previous call"),
+    chunk_size: int = Field(default=8000, description="Maximum characters per chunk", ge=1, le=100000),
+) -> dict:
+    offset, version = 0, None
+    if cursor:
+        position = decode_cursor(cursor)
+        if (
+            position.get("doc_id") != doc_id
+            or not isinstance(position.get("offset"), int)
+            or not isinstance(position.get("version"), int)
+        ):
+            raise ValueError(f"Cursor does not belong to doc {doc_id}")
+        offset, version = position["offset"], position["version"]
+
+    try:
+        chunk = store.read_chunk(doc_id, offset, chunk_size, expected_version=version)
+    except VersionConflictError as error:
+        raise ValueError(
+            f"Doc {doc_id} was edited after this cursor was issued (version {error.expected}, "
+            f"now {error.actual}); read it again from the start without a cursor"
+        ) from None
+    return {
+        "doc_id": doc_id,
+        "text": chunk.text,
+        "offset": chunk.offset,
+        "total_length": chunk.total_length,
+        "version": chunk.version,
+        "next_cursor": (
+            encode_cursor(doc_id=doc_id, offset=chunk.next_offset, version=chunk.version)
+            if chunk.next_offset is not None
+            else None
+        ),
+    }
+
+@executor.tool(
+    EDIT_POLICY,
     name="edit_document",
-    description="Edit a document by replacing a string in the document's content with new text."
+    description=(
+        "Edit a document by replacing a string in the document's content with new text. "
+        "The string must occur exactly once unless replace_all is set. Pass the version "
+        "returned by a previous read or edit as expected_version to make sure no one "
+        "else changed the document in between."
+    ),
+    annotations=ToolAnnotations(readOnlyHint=False, destructiveHint=False),
 )
 def edit_document(
     doc_id: str = Field(description="Id of the document to be edited"),
     old_str: str = Field(description="The text to replace. Must match exactly."),
-    new_str: str = Field(description="The new text to insert.")
+    new_str: str = Field(description="The new text to insert."),
+    expected_version: int | None = Field(default=None, description="Only edit if the document is still at this version"),
+    replace_all: bool = Field(default=False, description="Replace every occurrence of old_str"),
 ):
-    if doc_id not in docs:
-        raise ValueError(f"Doc with id {doc_id} not found")
-    docs[doc_id] = docs[doc_id].replace(old_str, new_str)
-    return f"Successfully updated document {doc_id}"
-# TODO: Write a resource to return all doc id's
-# TODO: Write a resource to return the contents of a particular doc
-# TODO: Write a prompt to rewrite a doc in markdown format
-# TODO: Write a prompt to summarize a doc
-
-mcp_app = mcp.streamable_http_app()
\ No newline at end of file
+    version = store.replace(doc_id, old_str, new_str, expected_version, replace_all)
+    return f"Successfully updated document {doc_id} (now at version {version})"
+
+@executor.tool(
+    READ_POLICY,
+    name="read_many_docs",
+    description=(
+        "Read several documents in one call. Returns one entry per id, in order, with "
+        "the document's text and version, or an error if it could not be read."
+    ),
+    annotations=ToolAnnotations(readOnlyHint=True),
+)
+def read_many_docs(
+    doc_ids: list[str] = Field(description="Ids of the documents to read", min_length=1, max_length=50),
+    max_chars: int | None = Field(default=None, description="Truncate each document to this many characters", ge=1),
+) -> list[dict]:
+    results = []
+    for doc_id in doc_ids:
+        try:
+            snapshot = store.snapshot(doc_id)
+        except DocumentNotFoundError as error:
+            results.append({"doc_id": doc_id, "error": str(error)})
+            continue
+        length = len(snapshot.text)
+        end = length if max_chars is None else min(length, max_chars)
+        results.append({
+            "doc_id": doc_id,
+            "version": snapshot.version,
+            "text": snapshot.text.slice(0, end),
+            "truncated": end < length,
+        })
+    return results
+
+class EditOperation(BaseModel):
+    doc_id: str = Field(description="Id of the document to be edited")
+    old_str: str = Field(description="The text to replace. Must match exactly.")
+    new_str: str = Field(description="The new text to insert.")
+    replace_all: bool = Field(default=False, description="Replace every occurrence of old_str")
+    expected_version: int | None = Field(default=None, description="Only edit if the document is still at this version")
+
+@executor.tool(
+    EDIT_POLICY,
+    name="apply_edits",
+    description=(
+        "Apply several edits, to one or more documents, in one call. Edits to the same "
+        "document are applied in order and atomically: if one fails, none of that "
+        "document's edits are applied. Returns one result per edit, in order."
+    ),
+    annotations=ToolAnnotations(readOnlyHint=False, destructiveHint=False),
+)
+def apply_edits(
+    edits: list[EditOperation] = Field(description="The edits to apply", min_length=1, max_length=100),
+) -> list[dict]:
+    by_doc: dict[str, list[int]] = {}
+    for index, edit in enumerate(edits):
+        by_doc.setdefault(edit.doc_id, []).append(index)
+
+    results: list[dict] = [{} for _ in edits]
+    for doc_id, indexes in by_doc.items():
+        versions = {edits[index].expected_version for index in indexes} - {None}
+        try:
+            if len(versions) > 1:
+                raise ValueError(f"Edits to doc {doc_id} expect different versions")
+            version = store.replace_many(
+                doc_id,
+                [
+                    Replacement(edits[index].old_str, edits[index].new_str, edits[index].replace_all)
+                    for index in indexes
+                ],
+                versions.pop() if versions else None,
+            )
+        except ValueError as error:
+            failed = indexes[error.index] if isinstance(error, EditError) else None
+            for index in indexes:
+                message = str(error)
+                if failed is not None and index != failed:
+                    message = f"Not applied because edit {failed} to the same document failed"
+                results[index] = {"index": index, "doc_id": doc_id, "ok": False, "error": message}
+            continue
+        for index in indexes:
+            results[index] = {"index": index, "doc_id": doc_id, "ok": True, "version": version}
+    return results
+
+@executor.tool(
+    SEARCH_POLICY,
+    name="search_docs",
+    description=(
+        "Search all documents for the given terms. Returns the best matching "
+        "document ids ranked by relevance, each with a short snippet."
+    ),
+    annotations=ToolAnnotations(readOnlyHint=True),
+)
+def search_docs(
+    query: str = Field(description="Words to search for"),
+    limit: int = Field(default=10, description="Maximum number of results", ge=1, le=50),
+) -> list[dict]:
+    return [
+        {"doc_id": result.doc_id, "score": result.score, "snippet": result.snippet}
+        for result in store.search(query, limit)
+    ]
+
+# Listings are served a page at a time. A page is {"items": [...], "next": uri},
+# where "next" is the URI of the following page, or null on the last one.
+PAGE_SIZE = 500
+
+def _id_page(prefix: str, after: str | None) -> dict:
+    ids, more = store.list_ids(prefix, after, PAGE_SIZE)
+    next_uri = None
+    if more:
+        next_uri = f"docs://documents/pages/{encode_cursor(prefix=prefix, after=ids[-1])}"
+    return {"items": ids, "next": next_uri}
+
+@mcp.resource(
+    "docs://documents",
+    mime_type="application/json"
+)
+def list_docs() -> dict:
+    return _id_page("", None)
+
+@mcp.resource(
+    "docs://documents/prefix/{prefix}",
+    mime_type="application/json"
+)
+def list_docs_with_prefix(prefix: str) -> dict:
+    return _id_page(unquote(prefix), None)
+
+@mcp.resource(
+    "docs://documents/pages/{cursor}",
+    mime_type="application/json"
+)
+def list_docs_page(cursor: str) -> dict:
+    position = decode_cursor(cursor)
+    prefix, after = position.get("prefix"), position.get("after")
+    if not isinstance(prefix, str) or not isinstance(after, str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return _id_page(prefix, after)
+
+@mcp.resource(
+    "docs://documents/{doc_id}",
+    mime_type="text/plain"
+)
+def fetch_doc(doc_id: str) -> str:
+    return store.get(unquote(doc_id))
+
+async def list_resources_page(request: types.ListResourcesRequest) -> types.ServerResult:
+    """Lists the fixed resources, then every document, PAGE_SIZE documents per page."""
+    cursor = request.params.cursor if request.params else None
+    after = decode_cursor(cursor).get("after") if cursor else None
+    if stateful:
+        notifier.track(mcp._mcp_server.request_context.session)
+    resources = [] if after is not None else await mcp.list_resources()
+    ids, more = store.list_ids(after=after, limit=PAGE_SIZE)
+    resources += [
+        types.Resource(uri=doc_uri(doc_id), name=doc_id, mimeType="text/plain")
+        for doc_id in ids
+    ]
+    return types.ServerResult(
+        types.ListResourcesResult(
+            resources=resources,
+            nextCursor=encode_cursor(after=ids[-1]) if more else None,
+        )
+    )
+
+mcp._mcp_server.request_handlers[types.ListResourcesRequest] = list_resources_page
+
+@mcp.resource(
+    "metrics://tools",
+    mime_type="application/json"
+)
+def tool_metrics() -> dict:
+    """Per-tool calls running and queued, and wait and run times, in this worker."""
+    return executor.stats()
+
+if stateful:
+    @mcp._mcp_server.subscribe_resource()
+    async def subscribe(uri: AnyUrl):
+        notifier.subscribe(str(uri), mcp._mcp_server.request_context.session)
+
+    @mcp._mcp_server.unsubscribe_resource()
+    async def unsubscribe(uri: AnyUrl):
+        notifier.unsubscribe(str(uri), mcp._mcp_server.request_context.session)
+
+    create_initialization_options = mcp._mcp_server.create_initialization_options
+
+    def create_subscribable_initialization_options(
+        notification_options: NotificationOptions | None = None,
+        experimental_capabilities: dict | None = None,
+    ):
+        options = create_initialization_options(
+            notification_options or NotificationOptions(resources_changed=True),
+            experimental_capabilities,
+        )
+        # The low-level server always advertises subscribe=False.
+        options.capabilities.resources.subscribe = True
+        return options
+
+    mcp._mcp_server.create_initialization_options = create_subscribable_initialization_options
+
+@mcp.prompt(
+    name="format",
+    description="Rewrites the contents of the document in Markdown format."
+)
+def format_document(
+    doc_id: str = Field(description="Id of the document to format")
+) -> list[base.Message]:
+    prompt = f"""
+    Your goal is to reformat a document to be written with markdown syntax.
+
+    The id of the document you need to reformat is:
+    <document_id>
+    {doc_id}
+    </document_id>
+
+    Add in headers, bullet points, tables, etc as necessary. Feel free to add in structure.
+    Use the 'apply_edits' tool to make all of your edits in a single call. After the document has been reformatted, summarize the changes you made.
+    """
+    return [base.UserMessage(prompt)]
+
+@mcp.prompt(
+    name="summarize",
+    description="Summarizes the contents of the document."
+)
+def summarize_document(
+    doc_id: str = Field(description="Id of the document to summarize")
+) -> list[base.Message]:
+    prompt = f"""
+    Your goal is to summarize the contents of the document.
+
+    The id of the document you need to summarize is:
+    <document_id>
+    {doc_id}
+    </document_id>
+
+    Use the 'read_doc_contents' tool to read the document, then reply with a concise summary.
+    """
+    return [base.UserMessage(prompt)]
+
+mcp_app = mcp.streamable_http_app()
+
+@asynccontextmanager
+async def background_services():
+    """Runs change notifications and the DOCS_DIR watcher while the context is open.
+
+    Entered by the HTTP app's lifespan; hosts that run the server in-process
+    enter it themselves.
+    """
+    notifier.start(asyncio.get_running_loop())
+    watcher = asyncio.create_task(ingestor.watch()) if ingestor else None
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+            ingestor.close()
+        executor.shutdown()
+
+session_lifespan = mcp_app.router.lifespan_context
+
+@asynccontextmanager
+async def lifespan(app):
+    async with session_lifespan(app), background_services():
+        yield
+
+mcp_app.router.lifespan_context = lifespan
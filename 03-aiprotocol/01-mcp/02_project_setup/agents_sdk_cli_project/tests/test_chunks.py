@@ -0,0 +1,54 @@
+import pytest
+
+from document_store.cursor import decode_cursor, encode_cursor
+from document_store.document import VersionConflictError
+from document_store.store import DocumentStore
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(doc_id="a b/é", offset=8000, version=3)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == {"doc_id": "a b/é", "offset": 8000, "version": 3}
+
+
+# The last two decode to [1,2] and null, neither of which is a position.
+@pytest.mark.parametrize("cursor", ["not base64!", "WzEsMl0", "bnVsbA"])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_chunks_cover_the_document_and_end_at_line_breaks():
+    text = "".join(f"line {number:03}\n" for number in range(200))
+    store = DocumentStore({"doc": text})
+
+    chunks = []
+    offset = 0
+    while offset is not None:
+        chunk = store.read_chunk("doc", offset, chunk_size=100)
+        chunks.append(chunk)
+        offset = chunk.next_offset
+
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert all(chunk.text.endswith("\n") for chunk in chunks)
+    assert all(len(chunk.text) <= 100 for chunk in chunks)
+    assert chunks[0].total_length == len(text)
+    assert chunks[-1].next_offset is None
+
+
+def test_long_lines_are_split_at_chunk_size():
+    store = DocumentStore({"doc": "x" * 250})
+    chunk = store.read_chunk("doc", 0, chunk_size=100)
+    assert len(chunk.text) == 100
+    assert chunk.next_offset == 100
+
+
+def test_chunk_of_an_edited_document_fails_its_version_check():
+    store = DocumentStore({"doc": "first line\nsecond line\n"})
+    chunk = store.read_chunk("doc", 0, chunk_size=12)
+    assert store.read_chunk("doc", chunk.next_offset, expected_version=chunk.version).text == "second line\n"
+
+    store.edit("doc", 0, 0, "inserted\n")
+    with pytest.raises(VersionConflictError) as raised:
+        store.read_chunk("doc", chunk.next_offset, expected_version=chunk.version)
+    assert (raised.value.expected, raised.value.actual) == (chunk.version, chunk.version + 1)
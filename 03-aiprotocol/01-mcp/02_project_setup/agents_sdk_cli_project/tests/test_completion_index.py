@@ -0,0 +1,58 @@
+from core.completion_index import CompletionIndex, PrefixTrie
+
+
+def test_trie_returns_prefix_matches_in_order():
+    trie = PrefixTrie()
+    for value in ["report.pdf", "Readme.md", "reports-2024.md", "plan.md"]:
+        trie.insert(value)
+    assert list(trie.iter_prefix("re")) == ["Readme.md", "report.pdf", "reports-2024.md"]
+    assert list(trie.iter_prefix("REPORT")) == ["report.pdf", "reports-2024.md"]
+    assert list(trie.iter_prefix("")) == ["plan.md", "Readme.md", "report.pdf", "reports-2024.md"]
+    assert list(trie.iter_prefix("x")) == []
+
+
+def test_trie_remove_merges_split_edges():
+    trie = PrefixTrie()
+    for value in ["report", "reports", "repo"]:
+        trie.insert(value)
+    trie.remove("reports")
+    trie.remove("missing")
+    assert list(trie.iter_prefix("rep")) == ["repo", "report"]
+    trie.remove("repo")
+    assert list(trie.iter_prefix("rep")) == ["report"]
+    # Re-inserting after the merges finds the right edges again.
+    trie.insert("reports")
+    assert list(trie.iter_prefix("report")) == ["report", "reports"]
+
+
+def test_trie_keeps_values_that_fold_to_the_same_key():
+    trie = PrefixTrie()
+    trie.insert("Plan.md")
+    trie.insert("plan.md")
+    trie.remove("Plan.md")
+    assert list(trie.iter_prefix("plan")) == ["plan.md"]
+
+
+def test_search_puts_prefix_matches_before_fuzzy_ones():
+    index = CompletionIndex()
+    index.update(["deposition.md", "outlook.pdf", "plan.md", "spec.txt"])
+    assert index.search("dep") == ["deposition.md"]
+    # "pd" is a prefix of nothing, but a subsequence of these; tighter and earlier ranks first.
+    assert index.search("pd") == ["outlook.pdf", "plan.md", "deposition.md"]
+    assert index.search("zz") == []
+    assert index.search("", limit=2) == ["deposition.md", "outlook.pdf"]
+
+
+def test_update_applies_only_the_difference():
+    index = CompletionIndex()
+    index.update(["a.md", "b.md"])
+    index.update(["b.md", "c.md"])
+    assert len(index) == 2
+    assert index.search("a") == []
+    assert index.search("") == ["b.md", "c.md"]
+
+    index.add("a.md")
+    index.remove("b.md")
+    index.remove("b.md")
+    assert index.search("") == ["a.md", "c.md"]
+    assert index.search("bm") == []
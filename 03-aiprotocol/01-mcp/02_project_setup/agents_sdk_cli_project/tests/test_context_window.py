@@ -0,0 +1,63 @@
+from core.context_window import SUMMARY_PREFIX, ContextWindow, estimate_tokens
+
+
+def turn(number: int, size: int = 400) -> list[dict]:
+    return [
+        {"role": "user", "content": f"question {number} " + "q" * size},
+        {"type": "function_call", "name": "read_doc", "call_id": f"call-{number}", "arguments": "{}"},
+        {"type": "function_call_output", "call_id": f"call-{number}", "output": "o" * size},
+        {"role": "assistant", "content": f"answer {number} " + "a" * size},
+    ]
+
+
+def test_history_within_budget_is_unchanged():
+    window = ContextWindow(max_tokens=10_000)
+    messages = turn(1) + turn(2)
+    assert window.compact(list(messages)) == messages
+
+
+def test_long_tool_output_is_trimmed():
+    window = ContextWindow(max_tool_output_tokens=10)
+    messages = window.compact([
+        {"role": "user", "content": "hi"},
+        {"type": "function_call_output", "call_id": "c", "output": "x" * 1000},
+    ])
+    output = messages[1]["output"]
+    assert output.startswith("x" * 40)
+    assert "960 characters of tool output trimmed" in output
+
+
+def test_oldest_turns_are_replaced_by_a_summary():
+    window = ContextWindow(max_tokens=700)
+    messages = []
+    for number in range(1, 6):
+        messages = window.compact(messages + turn(number))
+
+    summary = messages[0]
+    assert summary["content"].startswith(SUMMARY_PREFIX)
+    assert "question 1" in summary["content"]
+    assert "Tools used: read_doc" in summary["content"]
+    # Turns are dropped whole: the rest starts with a user message and ends with the latest turn.
+    assert messages[1]["role"] == "user"
+    assert messages[-4:] == turn(5)
+    assert window.token_count == sum(estimate_tokens(item) for item in messages)
+    assert window.token_count <= 700
+
+
+def test_latest_turn_is_kept_even_over_budget():
+    window = ContextWindow(max_tokens=50)
+    messages = window.compact(turn(1) + turn(2))
+    assert messages[-4:] == turn(2)
+    assert len(messages) == 5
+
+
+def test_summary_keeps_only_the_latest_lines():
+    window = ContextWindow(max_tokens=400, max_summary_lines=2)
+    messages = []
+    for number in range(1, 8):
+        messages = window.compact(messages + turn(number, size=200))
+
+    lines = messages[0]["content"].splitlines()
+    assert lines[0] == SUMMARY_PREFIX
+    assert len(lines) == 3
+    assert "question 1 " not in messages[0]["content"]
@@ -0,0 +1,59 @@
+import math
+
+import pytest
+
+from document_store.index import InvertedIndex, tokenize
+
+
+def test_tokenize_lowercases_and_keeps_offsets():
+    assert tokenize("The Tower, tower!") == [("the", 0), ("tower", 4), ("tower", 11)]
+
+
+def test_bm25_score_of_a_single_match():
+    index = InvertedIndex(k1=1.2, b=0.75)
+    index.add("a", "condenser tower")
+    index.add("b", "cooling fan")
+    [hit] = index.search("tower")
+    # Both documents have the average length, so the length norm is 1.
+    idf = math.log(1 + (2 - 1 + 0.5) / (1 + 0.5))
+    assert hit.doc_id == "a"
+    assert hit.score == pytest.approx(idf)
+    assert hit.offsets == [10]
+
+
+def test_rarer_terms_and_more_occurrences_rank_higher():
+    index = InvertedIndex()
+    index.add("common", "report report report")
+    index.add("rare", "report tower")
+    index.add("other", "report summary")
+    # "tower" appears in one document, "report" in all three.
+    assert [hit.doc_id for hit in index.search("report tower")] == ["rare", "common", "other"]
+    assert [hit.doc_id for hit in index.search("report")][0] == "common"
+
+
+def test_shorter_documents_rank_higher_for_the_same_frequency():
+    index = InvertedIndex()
+    index.add("short", "tower")
+    index.add("long", "tower " + "filler " * 20)
+    index.add("none", "nothing here")
+    assert [hit.doc_id for hit in index.search("tower")] == ["short", "long"]
+
+
+def test_ties_are_broken_by_id_and_limit_applies():
+    index = InvertedIndex()
+    for doc_id in ["c", "a", "b"]:
+        index.add(doc_id, "same text")
+    assert [hit.doc_id for hit in index.search("text", limit=2)] == ["a", "b"]
+
+
+def test_readding_and_removing_update_postings():
+    index = InvertedIndex()
+    index.add("a", "old words")
+    index.add("a", "new words")
+    assert index.search("old") == []
+    assert [hit.offsets for hit in index.search("new words")] == [[0, 4]]
+
+    index.remove("a")
+    assert "a" not in index
+    assert len(index) == 0
+    assert index.search("words") == []
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from document_store.document import Document, VersionConflictError
+from document_store.piece_table import PieceTable
+from document_store.text_source import StringSource
+
+
+def table(text: str) -> PieceTable:
+    return PieceTable.from_source(StringSource(text))
+
+
+def test_splice_leaves_the_original_table_unchanged():
+    original = table("hello world")
+    edited = original.splice(6, 5, "there").splice(0, 0, "> ")
+    assert edited.text() == "> hello there"
+    assert original.text() == "hello world"
+
+
+def test_splice_many_uses_offsets_before_the_edits():
+    edited = table("a-b-c").splice_many([(0, 1, "AA"), (2, 1, ""), (4, 1, "CCC")])
+    assert edited.text() == "AA--CCC"
+
+
+@pytest.mark.parametrize("edits", [[(3, 1, "x"), (1, 1, "y")], [(0, -1, "")], [(4, 2, "")]])
+def test_invalid_edits_are_rejected(edits):
+    with pytest.raises(ValueError, match="out of order or outside"):
+        table("abcde").splice_many(edits)
+
+
+def test_random_edits_match_string_edits():
+    rng = random.Random(14)
+    text = "".join(rng.choice("ab\n") for _ in range(200))
+    pieces = table(text)
+    for _ in range(300):
+        start = rng.randrange(len(text) + 1)
+        delete = rng.randrange(min(5, len(text) - start) + 1)
+        insert = "".join(rng.choice("xy\n") for _ in range(rng.randrange(4)))
+        text = text[:start] + insert + text[start + delete:]
+        pieces = pieces.splice(start, delete, insert)
+
+    assert pieces.text() == text
+    assert pieces.slice(17, 93) == text[17:93]
+    assert pieces.find("x\ny") == text.find("x\ny")
+    assert pieces.line_count() == table(text).line_count()
+    assert list(pieces.newline_offsets()) == [i for i, char in enumerate(text) if char == "\n"]
+    assert pieces.compacted().text() == text
+    assert len(pieces.compacted().pieces) == 1
+
+
+def test_line_spans_across_pieces():
+    pieces = table("one\ntwo\n").splice(8, 0, "three\nfour")
+    assert pieces.line_count() == 4
+    assert pieces.slice(*pieces.line_span(2, 3)) == "two\nthree\n"
+    assert pieces.slice(*pieces.line_span(4, 9)) == "four"
+
+
+def test_commit_checks_the_base_version():
+    document = Document("doc", StringSource("v1"))
+    snapshot = document.snapshot
+    assert document.commit(snapshot.text.splice(0, 2, "v2"), base_version=1).version == 2
+
+    with pytest.raises(VersionConflictError) as raised:
+        document.commit(snapshot.text.splice(0, 2, "stale"), base_version=1)
+    assert (raised.value.expected, raised.value.actual) == (1, 2)
+    assert document.snapshot.text.text() == "v2"
+    # The reader's old snapshot still shows the text it was taken from.
+    assert snapshot.text.text() == "v1"
+
+
+def test_commit_compacts_tables_with_too_many_pieces():
+    document = Document("doc", StringSource(""), max_pieces=4)
+    for number in range(6):
+        snapshot = document.snapshot
+        document.commit(snapshot.text.splice(len(snapshot.text), 0, str(number)))
+    assert document.snapshot.text.text() == "012345"
+    assert len(document.snapshot.text.pieces) <= 4
+    assert document.version == 7
+
@@ -0,0 +1,70 @@
+from mcp.types import CallToolResult, TextContent, Tool, ToolAnnotations
+
+from core.tool_cache import ToolResultCache
+
+
+def result(text: str, is_error: bool = False) -> CallToolResult:
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=is_error)
+
+
+def test_only_read_only_or_allowed_tools_are_cacheable():
+    cache = ToolResultCache(allow_list={"search"})
+    schema = {"type": "object"}
+    assert cache.is_cacheable(Tool(name="read", inputSchema=schema, annotations=ToolAnnotations(readOnlyHint=True)))
+    assert cache.is_cacheable(Tool(name="search", inputSchema=schema))
+    assert not cache.is_cacheable(Tool(name="edit", inputSchema=schema))
+
+
+def test_results_are_keyed_by_canonical_arguments():
+    cache = ToolResultCache()
+    cache.put("docs", "read", {"doc_id": "a", "lines": [1, 2]}, result("a"))
+    assert cache.get("docs", "read", {"lines": [1, 2], "doc_id": "a"}).content[0].text == "a"
+    assert cache.get("docs", "read", {"doc_id": "b"}) is None
+    assert cache.get("other", "read", {"doc_id": "a", "lines": [1, 2]}) is None
+
+
+def test_errors_are_not_cached():
+    cache = ToolResultCache()
+    cache.put("docs", "read", {"doc_id": "a"}, result("boom", is_error=True))
+    assert cache.get("docs", "read", {"doc_id": "a"}) is None
+
+
+def test_write_drops_reads_of_the_same_target_only():
+    cache = ToolResultCache()
+    cache.put("docs", "read", {"doc_id": "a"}, result("a"))
+    cache.put("docs", "read", {"doc_id": "b"}, result("b"))
+    cache.put("docs", "search", {"query": "x"}, result("hits"))
+    cache.put("other", "read", {"doc_id": "a"}, result("elsewhere"))
+
+    cache.invalidate_for_write("docs", {"doc_id": "a", "new_str": "y"})
+
+    assert cache.get("docs", "read", {"doc_id": "a"}) is None
+    # A search has no doc_id, so it may include the edited document.
+    assert cache.get("docs", "search", {"query": "x"}) is None
+    assert cache.get("docs", "read", {"doc_id": "b"}) is not None
+    assert cache.get("other", "read", {"doc_id": "a"}) is not None
+
+
+def test_invalidate_server_and_expiry(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("core.tool_cache.time.monotonic", lambda: clock[0])
+    cache = ToolResultCache(ttl=10)
+    cache.put("docs", "read", {"doc_id": "a"}, result("a"))
+    cache.put("other", "read", {"doc_id": "a"}, result("a"))
+
+    cache.invalidate_server("docs")
+    assert cache.get("docs", "read", {"doc_id": "a"}) is None
+    assert cache.get("other", "read", {"doc_id": "a"}) is not None
+
+    clock[0] += 11
+    assert cache.get("other", "read", {"doc_id": "a"}) is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = ToolResultCache(max_entries=2)
+    cache.put("docs", "read", {"doc_id": "a"}, result("a"))
+    cache.put("docs", "read", {"doc_id": "b"}, result("b"))
+    cache.get("docs", "read", {"doc_id": "a"})
+    cache.put("docs", "read", {"doc_id": "c"}, result("c"))
+    assert cache.get("docs", "read", {"doc_id": "b"}) is None
+    assert cache.get("docs", "read", {"doc_id": "a"}) is not None
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import functools
+import importlib.util
+import json
+import logging
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
+
+HERE = Path(__file__).resolve().parent
+HELLO_DIR = HERE.parent / "01-hello-mcp"
+DOCS_DIR = HERE.parent / "02_project_setup" / "agents_sdk_cli_project"
+
+# The document server's modules, and its MCPClient, are imported from its
+# project folder; the load loop is shared with 01-hello-mcp/client.py.
+sys.path.insert(0, str(DOCS_DIR))
+sys.path.insert(0, str(HERE.parent / "shared"))
+
+from latency import measure  # noqa: E402
+from mcp_client import MCPClient  # noqa: E402
+
+Operation = Callable[[MCPClient], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class Target:
+    directory: Path
+    module: str
+    scenarios: dict[str, Operation]
+
+
+TARGETS = {
+    "hello": Target(
+        HELLO_DIR,
+        "main",
+        {
+            "tools/list": lambda client: client.list_tools(),
+            "tools/call": lambda client: client.call_tool("get_weather", {"city": "Paris"}),
+            "resources/read": lambda client: client.read_resource("metrics://tools"),
+        },
+    ),
+    "docs": Target(
+        DOCS_DIR,
+        "mcp_server",
+        {
+            "tools/list": lambda client: client.list_tools(),
+            "tools/call": lambda client: client.call_tool("read_doc_contents", {"doc_id": "report.pdf"}),
+            "resources/read": lambda client: client.read_resource("docs://documents/report.pdf"),
+        },
+    ),
+}
+
+
+@dataclass
+class Result:
+    target: str
+    transport: str
+    scenario: str
+    concurrency: int
+    requests: int
+    errors: int
+    seconds: float
+    requests_per_second: float
+    mean_ms: float | None = None
+    p50_ms: float | None = None
+    p95_ms: float | None = None
+    p99_ms: float | None = None
+    max_ms: float | None = None
+
+
+def load_server(target: Target) -> Any:
+    """Imports the target's FastMCP server under a unique module name."""
+    spec = importlib.util.spec_from_file_location(
+        f"bench_{target.module}_{abs(hash(target.directory))}", target.directory / f"{target.module}.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, str(target.directory))
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(target.directory))
+    return module
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def uvicorn_server(target: Target, workers: int) -> Iterator[str]:
+    """Runs the target under uvicorn in a subprocess and yields its MCP URL."""
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn",
+            "--app-dir", str(target.directory),
+            f"{target.module}:mcp_app",
+            "--port", str(port),
+            "--workers", str(workers),
+            "--log-level", "warning",
+        ],
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join([str(target.directory), str(DOCS_DIR)]),
+            "FASTMCP_LOG_LEVEL": "WARNING",
+        },
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("uvicorn did not start within 30s") from None
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}/mcp/"
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@asynccontextmanager
+async def connect(target: Target, transport: str, concurrency: int, workers: int) -> AsyncIterator[MCPClient]:
+    if transport == "inprocess":
+        server = load_server(target)
+        async with AsyncExitStack() as stack:
+            # Hosts running the document server in-process start its background tasks.
+            if hasattr(server, "background_services"):
+                await stack.enter_async_context(server.background_services())
+            yield await stack.enter_async_context(
+                MCPClient(server=server.mcp, max_concurrent_calls=concurrency)
+            )
+        return
+    with uvicorn_server(target, workers) as url:
+        async with MCPClient(server_url=url, max_concurrent_calls=concurrency) as client:
+            yield client
+
+
+async def run_benchmarks(options: argparse.Namespace) -> list[Result]:
+    results = []
+    for target_name in options.targets:
+        target = TARGETS[target_name]
+        for transport in options.transports:
+            for concurrency in options.concurrency:
+                async with connect(target, transport, concurrency, options.workers) as client:
+                    for scenario in options.scenarios:
+                        operation = target.scenarios[scenario]
+                        call = functools.partial(operation, client)
+                        await measure(call, options.warmup, concurrency)
+                        stats = await measure(call, options.requests, concurrency)
+                        result = Result(target_name, transport, scenario, concurrency, **stats)
+                        results.append(result)
+                        print(
+                            f"{target_name:6} {transport:9} {scenario:15} c={concurrency:<4} "
+                            f"{result.requests_per_second:9.1f} req/s  p50 {result.p50_ms} ms  "
+                            f"p95 {result.p95_ms} ms  p99 {result.p99_ms} ms  errors {result.errors}",
+                            flush=True,
+                        )
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    from importlib.metadata import version
+
+    return {
+        "commit": git_commit(),
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "mcp": version("mcp"),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def result_key(result: dict) -> tuple:
+    return result["target"], result["transport"], result["scenario"], result["concurrency"]
+
+
+def compare(baseline_path: Path, candidate_path: Path):
+    """Prints the change in throughput and tail latency of each benchmark in both files."""
+    baseline = json.loads(baseline_path.read_text())
+    candidate = json.loads(candidate_path.read_text())
+    before = {result_key(result): result for result in baseline["results"]}
+    print(f"{baseline['environment'].get('commit')} -> {candidate['environment'].get('commit')}")
+    for result in candidate["results"]:
+        old = before.get(result_key(result))
+        if old is None:
+            continue
+        target, transport, scenario, concurrency = result_key(result)
+        changes = []
+        for field, label in (("requests_per_second", "req/s"), ("p50_ms", "p50"), ("p95_ms", "p95"), ("p99_ms", "p99")):
+            if old.get(field) and result.get(field) is not None:
+                changes.append(f"{label} {old[field]} -> {result[field]} ({(result[field] / old[field] - 1) * 100:+.1f}%)")
+        print(f"{target:6} {transport:9} {scenario:15} c={concurrency:<4} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the MCP servers in this module.")
+    commands = parser.add_subparsers(dest="command")
+
+    run = commands.add_parser("run", help="Run benchmarks and write the results as JSON")
+    run.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    run.add_argument("--transports", nargs="+", choices=["inprocess", "http"], default=["inprocess", "http"])
+    run.add_argument("--scenarios", nargs="+", choices=["tools/list", "tools/call", "resources/read"],
+                     default=["tools/list", "tools/call", "resources/read"])
+    run.add_argument("--concurrency", nargs="+", type=int, default=[1, 16])
+    run.add_argument("--requests", type=int, default=500, help="Requests per benchmark")
+    run.add_argument("--warmup", type=int, default=50, help="Unmeasured requests before each benchmark")
+    run.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for http")
+    run.add_argument("--output", type=Path, help="Results file (default: results/<commit>-<time>.json)")
+
+    diff = commands.add_parser("compare", help="Compare two results files")
+    diff.add_argument("baseline", type=Path)
+    diff.add_argument("candidate", type=Path)
+
+    options = parser.parse_args(sys.argv[1:] or ["run"])
+    if options.command == "compare":
+        compare(options.baseline, options.candidate)
+        return
+
+    # Per-request INFO logs from the servers and httpx would dominate the timings.
+    logging.disable(logging.INFO)
+    results = asyncio.run(run_benchmarks(options))
+    report = {
+        "environment": environment(),
+        "settings": {
+            "requests": options.requests,
+            "warmup": options.warmup,
+            "workers": options.workers,
+        },
+        "results": [asdict(result) for result in results],
+    }
+    output = options.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = HERE / "results" / f"{report['environment']['commit'] or 'local'}-{stamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import asyncio
+import math
+import statistics
+import time
+from typing import Any, Awaitable, Callable
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def measure(call: Callable[[], Awaitable[Any]], requests: int, concurrency: int) -> dict:
+    """Awaits `call` `requests` times, at most `concurrency` at once, and reports throughput and latency.
+
+    Failed calls count as errors and are left out of the latencies.
+    """
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    stats: dict[str, Any] = {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(latencies) / seconds, 1),
+    }
+    if latencies:
+        stats["mean_ms"] = round(statistics.fmean(latencies) * 1000, 3)
+        for name, fraction in (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            stats[name] = round(percentile(latencies, fraction) * 1000, 3)
+        stats["max_ms"] = round(latencies[-1] * 1000, 3)
+    return stats
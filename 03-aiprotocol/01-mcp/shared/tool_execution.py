@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Literal, TypeVar
+
+from mcp.server.fastmcp import FastMCP
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+@dataclass(frozen=True)
+class ExecutionPolicy:
+    """Where and how a tool function runs.
+
+    - "inline": on the event loop, for functions that return quickly.
+    - "thread": in the shared thread pool, for blocking I/O, or work that
+      releases the GIL.
+    - "process": in the shared process pool, for CPU-heavy work. The function
+      must be defined at module level and take and return picklable values,
+      and it runs in a fresh interpreter without this process's state.
+
+    At most `max_concurrency` calls of the tool run at once, and at most
+    `max_queue` more wait for a turn; further calls are rejected. A call that
+    runs longer than `timeout` seconds is answered with an error. A thread or
+    process cannot be interrupted, so it keeps its slot until it finishes.
+    """
+
+    mode: Literal["inline", "thread", "process"] = "inline"
+    max_concurrency: int = 4
+    max_queue: int = 32
+    timeout: float | None = 30.0
+
+
+INLINE = ExecutionPolicy()
+
+
+class ToolBusyError(RuntimeError):
+    pass
+
+
+@dataclass
+class ToolStats:
+    mode: str
+    running: int = 0
+    queued: int = 0
+    peak_queued: int = 0
+    completed: int = 0
+    failed: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    total_run: float = 0.0
+    max_run: float = 0.0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        # Timings are of completed calls only.
+        stats["mean_wait"] = self.total_wait / self.completed if self.completed else 0.0
+        stats["mean_run"] = self.total_run / self.completed if self.completed else 0.0
+        return stats
+
+
+def _timed(fn: Callable[..., Any], kwargs: dict) -> tuple[float, Any]:
+    # Wall-clock time, as the call may start in another process.
+    started = time.time()
+    return started, fn(**kwargs)
+
+
+class ToolExecutor:
+    """Registers tools on a FastMCP server, each run according to its ExecutionPolicy.
+
+    Slow tools run off the event loop, so they cannot stall the other
+    requests the server is handling, and per-tool limits keep one busy tool
+    from taking every worker. `stats()` reports, per tool, how many calls are
+    running and queued and how long calls waited for a slot and ran.
+    """
+
+    def __init__(self, server: FastMCP, thread_workers: int = 16, process_workers: int | None = None):
+        self.server = server
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._threads: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+        self._stats: dict[str, ToolStats] = {}
+
+    def tool(self, policy: ExecutionPolicy = INLINE, **options) -> Callable[[F], F]:
+        """Like FastMCP.tool, with the tool run according to policy.
+
+        Returns the function itself, so it can still be called directly and,
+        for the process pool, found by name in the worker processes.
+        """
+
+        def decorator(fn: F) -> F:
+            name = options.get("name") or fn.__name__
+            stats = self._stats[name] = ToolStats(policy.mode)
+            slots = asyncio.Semaphore(policy.max_concurrency)
+
+            @functools.wraps(fn)
+            async def run(**kwargs):
+                waiting = slots.locked()
+                if waiting and stats.queued >= policy.max_queue:
+                    stats.rejected += 1
+                    raise ToolBusyError(f"Tool {name} is busy; try again later")
+                arrived = time.time()
+                if waiting:
+                    stats.queued += 1
+                    stats.peak_queued = max(stats.peak_queued, stats.queued)
+                try:
+                    await slots.acquire()
+                finally:
+                    if waiting:
+                        stats.queued -= 1
+                stats.running += 1
+                execution = self._start(policy, fn, kwargs)
+
+                def finish(future: asyncio.Future):
+                    stats.running -= 1
+                    slots.release()
+                    if future.cancelled() or future.exception() is not None:
+                        stats.failed += 1
+                        return
+                    started, _ = future.result()
+                    finished = time.time()
+                    stats.completed += 1
+                    stats.total_wait += started - arrived
+                    stats.max_wait = max(stats.max_wait, started - arrived)
+                    stats.total_run += finished - started
+                    stats.max_run = max(stats.max_run, finished - started)
+
+                execution.add_done_callback(finish)
+                try:
+                    _, result = await asyncio.wait_for(asyncio.shield(execution), policy.timeout)
+                except asyncio.TimeoutError:
+                    stats.timed_out += 1
+                    raise TimeoutError(f"Tool {name} did not finish within {policy.timeout}s") from None
+                return result
+
+            self.server.tool(**options)(run)
+            return fn
+
+        return decorator
+
+    def _start(self, policy: ExecutionPolicy, fn: Callable[..., Any], kwargs: dict) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if policy.mode == "inline":
+            future = loop.create_future()
+            try:
+                future.set_result(_timed(fn, kwargs))
+            except Exception as error:
+                future.set_exception(error)
+            return future
+        return loop.run_in_executor(self._executor(policy.mode), _timed, fn, kwargs)
+
+    def _executor(self, mode: str) -> Executor:
+        if mode == "thread":
+            if self._threads is None:
+                self._threads = ThreadPoolExecutor(self.thread_workers, thread_name_prefix="tool")
+            return self._threads
+        if self._processes is None:
+            # Not forked: the server process already runs threads.
+            self._processes = ProcessPoolExecutor(
+                self.process_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._processes
+
+    def stats(self) -> dict[str, dict]:
+        return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+    def shutdown(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
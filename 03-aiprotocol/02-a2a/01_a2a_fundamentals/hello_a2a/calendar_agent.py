@@ -1,4 +1,10 @@
 # calendar_agent.py - Your First A2A Agent
+import json
+import os
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Collection
+
 from a2a.server.apps import A2AFastAPIApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.tasks import InMemoryTaskStore
@@ -7,18 +13,283 @@ from a2a.server.events import EventQueue, InMemoryQueueManager
 from a2a.utils import new_agent_text_message
 from a2a.types import AgentCapabilities, AgentCard, AgentSkill, AgentProvider
 
+from calendar_engine import Calendar, CalendarEngine, ConflictError, Event, parse_time
+
 # 🧠 PART 1: Your Agent's Brain (The Worker)
+WORKDAY_START = time(9)
+WORKDAY_END = time(17)
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+PARTS_OF_DAY = {"morning": (time(9), time(12)), "afternoon": (time(12), time(17)), "evening": (time(17), time(21))}
+SKILL_WORDS = [
+    ("find_conflicts", re.compile(r"conflict|overlap|double[- ]book", re.I)),
+    ("schedule_meeting", re.compile(r"\b(schedule|book|set up|add)\b", re.I)),
+    ("check_availability", re.compile(r"\b(free|available|availability|open|busy)\b", re.I)),
+]
+CLOCK = re.compile(r"\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b", re.I)
+DURATION = re.compile(r"(?<![\w.])(-?\d+(?:\.\d+)?)[\s-]*(hours?|hrs?|h|minutes?|mins?|m)\b", re.I)
+
+
+def describe(event: Event) -> str:
+    return f"{event.title} ({event.start:%a %d %b %H:%M}-{event.end:%H:%M})"
+
+
 class CalendarAgent:
     """
     This is your agent's brain - it does the actual calendar work.
     Think of it as a helpful assistant that knows about your schedule.
+
+    Every answer comes from the CalendarEngine, which indexes each calendar's
+    events in an interval tree. A message is either plain text, like the
+    skill examples, or a JSON object naming the skill:
+
+        {"skill": "check_availability", "start": "2025-06-03T15:00", "end": "2025-06-03T16:00"}
+        {"skill": "schedule_meeting", "title": "Review", "start": "...", "end": "...", "attendees": []}
+        {"skill": "find_conflicts", "start": "...", "end": "..."}
+
+    with an optional "calendar" (default "primary"). JSON requests get JSON replies.
+
+    When a meeting clashes, the suggested new start lies within
+    `working_hours` on one of `working_days` (0 is Monday).
     """
-    
+
+    def __init__(
+        self,
+        engine: CalendarEngine | None = None,
+        now: Callable[[], datetime] = datetime.now,
+        working_hours: tuple[time, time] = (WORKDAY_START, WORKDAY_END),
+        working_days: Collection[int] = range(5),
+    ):
+        self.engine = engine or CalendarEngine()
+        self.now = now
+        self.working_hours = working_hours
+        self.working_days = working_days
+
     async def invoke(self, message) -> str:
         """When someone asks your agent to do something, this method runs."""
-        # For now, just return a simple message
-        # Later, you'll add real calendar logic here
-        return "Hello! I'm your calendar assistant. I can help with scheduling and availability."
+        try:
+            request = json.loads(message)
+        except ValueError:
+            request = None
+        if isinstance(request, dict):
+            try:
+                return json.dumps(self.handle(request))
+            except (KeyError, TypeError, ValueError) as error:
+                return json.dumps({"error": str(error)})
+        return self.answer(message)
+
+    # --- Structured requests ---
+
+    def handle(self, request: dict) -> dict:
+        calendar = self.engine.calendar(request.get("calendar", "primary"))
+        skill = request.get("skill")
+        start = parse_time(request["start"]) if "start" in request else None
+        end = parse_time(request["end"]) if "end" in request else None
+
+        if skill == "check_availability":
+            if start is None or end is None:
+                raise ValueError("check_availability needs start and end")
+            min_minutes = request.get("min_minutes", 0)
+            if isinstance(min_minutes, bool) or not isinstance(min_minutes, (int, float)) or min_minutes < 0:
+                raise ValueError("min_minutes must be a non-negative number")
+            minimum = timedelta(minutes=min_minutes)
+            return {
+                "free": calendar.is_free(start, end),
+                "busy": [event.as_dict() for event in calendar.overlapping(start, end)],
+                "free_slots": [
+                    {"start": slot_start.isoformat(), "end": slot_end.isoformat()}
+                    for slot_start, slot_end in calendar.free_slots(start, end, minimum)
+                ],
+            }
+        if skill == "schedule_meeting":
+            if start is None or end is None:
+                raise ValueError("schedule_meeting needs start and end")
+            try:
+                event = calendar.add(
+                    request.get("title", "Meeting"),
+                    start,
+                    end,
+                    attendees=tuple(request.get("attendees", ())),
+                    allow_conflicts=request.get("allow_conflicts", False),
+                )
+            except ConflictError as error:
+                suggestion = self.suggest(calendar, end, end - start)
+                return {
+                    "scheduled": False,
+                    "conflicts": [event.as_dict() for event in error.conflicts],
+                    "suggested_start": suggestion and suggestion.isoformat(),
+                }
+            return {"scheduled": True, "event": event.as_dict()}
+        if skill == "find_conflicts":
+            return {
+                "conflicts": [
+                    [first.as_dict(), second.as_dict()] for first, second in calendar.conflicts(start, end)
+                ]
+            }
+        raise ValueError(f"Unknown skill {skill!r}")
+
+    def suggest(
+        self, calendar: Calendar, after: datetime, duration: timedelta, ignore: str | None = None
+    ) -> datetime | None:
+        """The first free start in working hours from `after`, and not in the past."""
+        return calendar.next_free_within(
+            max(after, self.now()), duration, self.working_hours, self.working_days, ignore=ignore
+        )
+
+    # --- Plain text requests ---
+
+    def answer(self, message: str) -> str:
+        text = message.strip()
+        calendar = self.engine.calendar("primary")
+        skill = next((skill for skill, words in SKILL_WORDS if words.search(text)), None)
+        try:
+            if skill == "find_conflicts":
+                return self.answer_conflicts(calendar, text)
+            if skill == "schedule_meeting":
+                return self.answer_schedule(calendar, text)
+            if skill == "check_availability":
+                return self.answer_availability(calendar, text)
+        except ValueError as error:
+            # Times and durations that can't be right, like 25:99.
+            return f"Sorry, I can't do that: {error}."
+        return (
+            "Hello! I'm your calendar assistant. I can check your availability, "
+            "schedule meetings and find conflicts, e.g. \"Am I free tomorrow at 3 PM?\""
+        )
+
+    def answer_availability(self, calendar: Calendar, text: str) -> str:
+        days, at, window = self.parse_when(text)
+        if at is not None:
+            duration = self.parse_duration(text)
+            end = at + (timedelta(minutes=30) if duration is None else duration)
+            busy = calendar.overlapping(at, end)
+            if not busy:
+                return f"You're free {at:%A %d %B} from {at:%H:%M} to {end:%H:%M}."
+            suggestion = calendar.next_free(end, end - at, until=datetime.combine(at.date(), self.working_hours[1]))
+            reply = f"You're busy then: {', '.join(describe(event) for event in busy)}."
+            if suggestion:
+                reply += f" The next free slot that day starts at {suggestion:%H:%M}."
+            return reply
+        minimum = self.parse_duration(text)
+        if minimum is None:
+            minimum = timedelta(0)
+        lines = []
+        for day in days:
+            start, end = (datetime.combine(day, edge) for edge in window)
+            slots = calendar.free_slots(max(start, self.now()), end, minimum)
+            free = ", ".join(f"{slot_start:%H:%M}-{slot_end:%H:%M}" for slot_start, slot_end in slots)
+            lines.append(f"{day:%a %d %b}: {free or 'fully booked'}")
+        return "Your free time:\n" + "\n".join(lines)
+
+    def answer_schedule(self, calendar: Calendar, text: str) -> str:
+        days, at, window = self.parse_when(text)
+        duration = self.parse_duration(text)
+        if duration is None:
+            duration = timedelta(hours=1)
+        title = self.parse_title(text)
+        if at is None:
+            # No time given: take the first free slot in the requested days.
+            for day in days:
+                start, end = (datetime.combine(day, edge) for edge in window)
+                at = calendar.next_free(max(start, self.now()), duration, until=end)
+                if at is not None:
+                    break
+            else:
+                return f"There's no free {duration_text(duration)} slot for {title}."
+        try:
+            event = calendar.add(title, at, at + duration, allow_conflicts=False)
+        except ConflictError as error:
+            reply = f"That clashes with {', '.join(describe(event) for event in error.conflicts)}."
+            suggestion = self.suggest(calendar, at + duration, duration)
+            if suggestion is not None:
+                reply += f" The next free {duration_text(duration)} starts {suggestion:%A %d %B at %H:%M}."
+            return reply
+        return f"Scheduled {describe(event)}."
+
+    def answer_conflicts(self, calendar: Calendar, text: str) -> str:
+        if any(word in text.lower() for word in ("today", "tomorrow", "week", *WEEKDAYS)):
+            days, _, _ = self.parse_when(text)
+            pairs = calendar.conflicts(
+                datetime.combine(days[0], time.min), datetime.combine(days[-1] + timedelta(days=1), time.min)
+            )
+        else:
+            pairs = calendar.conflicts()
+        if not pairs:
+            return "No conflicts found."
+        lines = []
+        for first, second in pairs[:20]:
+            line = f"- {describe(first)} overlaps {describe(second)}"
+            fix = self.suggest(calendar, second.start, second.duration, ignore=second.id)
+            if fix is not None:
+                line += f"; move the latter to {fix:%a %d %b %H:%M}"
+            lines.append(line)
+        more = f"\n...and {len(pairs) - 20} more." if len(pairs) > 20 else ""
+        return f"Found {len(pairs)} conflict(s):\n" + "\n".join(lines) + more
+
+    def parse_when(self, text: str) -> tuple[list[date], datetime | None, tuple[time, time]]:
+        """The days mentioned, the exact time if one is given, and the hours of day to consider."""
+        lower = text.lower()
+        today = self.now().date()
+        if "next week" in lower:
+            monday = today + timedelta(days=7 - today.weekday())
+            days = [monday + timedelta(days=offset) for offset in range(5)]
+        elif "week" in lower:
+            # The rest of the working week, or the weekend when it's already here.
+            days = [today + timedelta(days=offset) for offset in range(7 - today.weekday())]
+            days = [day for day in days if day.weekday() < 5] or days
+        elif "tomorrow" in lower:
+            days = [today + timedelta(days=1)]
+        elif weekday := next((name for name in WEEKDAYS if name in lower), None):
+            ahead = (WEEKDAYS.index(weekday) - today.weekday()) % 7
+            # "next Tuesday" is the one after the coming Tuesday.
+            if "next " + weekday in lower:
+                ahead += 7
+            days = [today + timedelta(days=ahead)]
+        else:
+            days = [today]
+
+        window = next(
+            (hours for part, hours in PARTS_OF_DAY.items() if part in lower), self.working_hours
+        )
+        clock = CLOCK.search(text)
+        if clock is None:
+            return days, None, window
+        hour, minute, meridiem = (
+            (int(clock[1]), int(clock[2] or 0), clock[3].lower()) if clock[1] else (int(clock[4]), int(clock[5]), None)
+        )
+        if minute > 59 or (hour > 23 if meridiem is None else not 1 <= hour <= 12):
+            raise ValueError(f"{clock[0]} is not a valid time of day")
+        if meridiem == "pm" and hour < 12:
+            hour += 12
+        elif meridiem == "am" and hour == 12:
+            hour = 0
+        return days, datetime.combine(days[0], time(hour, minute)), window
+
+    @staticmethod
+    def parse_duration(text: str) -> timedelta | None:
+        """The duration given in text, or None if there is none; raises ValueError unless it is positive."""
+        match = DURATION.search(text)
+        if match is None:
+            return None
+        amount = float(match[1])
+        if amount <= 0:
+            raise ValueError(f"{match[0].strip()} is not a valid duration")
+        return timedelta(hours=amount) if match[2].lower().startswith("h") else timedelta(minutes=amount)
+
+    @staticmethod
+    def parse_title(text: str) -> str:
+        match = re.search(
+            r"(?:schedule|book|set up|add)\s+(?:an?\s+|the\s+)?(.*?)"
+            r"(?=\s+(?:for|on|at|next|this|today|tomorrow)\b|[?.!]*$)",
+            DURATION.sub("", text),
+            re.I,
+        )
+        title = match[1].strip() if match else ""
+        return title[:1].upper() + title[1:] if title else "Meeting"
+
+
+def duration_text(duration: timedelta) -> str:
+    minutes = int(duration.total_seconds() // 60)
+    return f"{minutes // 60}-hour" if minutes % 60 == 0 else f"{minutes}-minute"
 
 # 🔄 PART 2: The Translator (Connects A2A to Your Brain)
 class CalendarAgentExecutor(AgentExecutor):
@@ -28,8 +299,9 @@ class CalendarAgentExecutor(AgentExecutor):
     """
     
     def __init__(self):
-        # Connect to your agent's brain
-        self.agent = CalendarAgent()
+        # Connect to your agent's brain, with the events in CALENDAR_FILE if set
+        path = os.getenv("CALENDAR_FILE")
+        self.agent = CalendarAgent(CalendarEngine.from_file(path) if path else None)
     
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
         """
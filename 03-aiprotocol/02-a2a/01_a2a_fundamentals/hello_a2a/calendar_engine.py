@@ -0,0 +1,361 @@
+import heapq
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from typing import Collection, Iterable, Iterator
+
+
+def parse_time(value: str) -> datetime:
+    """ISO 8601 time; times with an offset are converted to local time."""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
+@dataclass(frozen=True)
+class Event:
+    """A calendar entry covering [start, end): it ends the moment end begins."""
+
+    id: str
+    title: str
+    start: datetime
+    end: datetime
+    attendees: tuple[str, ...] = ()
+
+    @property
+    def duration(self) -> timedelta:
+        return self.end - self.start
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "title": self.title,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "attendees": list(self.attendees),
+        }
+
+
+@dataclass
+class _Node:
+    event: Event
+    priority: float = field(default_factory=random.random)
+    max_end: datetime | None = None
+    left: "_Node | None" = None
+    right: "_Node | None" = None
+
+    def __post_init__(self):
+        self.max_end = self.event.end
+
+    @property
+    def key(self) -> tuple:
+        return self.event.start, self.event.end, self.event.id
+
+    def update(self):
+        self.max_end = self.event.end
+        for child in (self.left, self.right):
+            if child is not None and child.max_end > self.max_end:
+                self.max_end = child.max_end
+
+
+class IntervalTree:
+    """Events ordered by start time, each subtree annotated with its latest end.
+
+    A treap: random priorities keep it balanced in expectation, so inserts
+    and removals take O(log n). An overlap query skips every subtree that
+    ends before the query starts, and everything right of the first event
+    starting after it ends, visiting O(log n) nodes besides the k matches.
+    """
+
+    def __init__(self):
+        self._root: _Node | None = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Event]:
+        """Events in order of start time."""
+        stack: list[_Node] = []
+        node = self._root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.event
+            node = node.right
+
+    def insert(self, event: Event):
+        self._root = self._insert(self._root, _Node(event))
+        self._size += 1
+
+    def remove(self, event: Event) -> bool:
+        size = self._size
+        self._root = self._remove(self._root, (event.start, event.end, event.id))
+        return self._size < size
+
+    def overlapping(self, start: datetime, end: datetime) -> list[Event]:
+        """Events that overlap [start, end), in order of start time."""
+        found: list[Event] = []
+        stack: list[_Node] = []
+        node = self._root
+        # An in-order walk that prunes as it goes, so results come out sorted.
+        while stack or node is not None:
+            while node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                break
+            node = stack.pop()
+            if node.event.start >= end:
+                # This and everything after it starts too late.
+                break
+            if node.event.end > start:
+                found.append(node.event)
+            node = node.right
+        return found
+
+    def _insert(self, root: _Node | None, node: _Node) -> _Node:
+        if root is None:
+            return node
+        if node.key < root.key:
+            root.left = self._insert(root.left, node)
+            if root.left.priority > root.priority:
+                root = self._rotate_right(root)
+        else:
+            root.right = self._insert(root.right, node)
+            if root.right.priority > root.priority:
+                root = self._rotate_left(root)
+        root.update()
+        return root
+
+    def _remove(self, root: _Node | None, key: tuple) -> _Node | None:
+        if root is None:
+            return None
+        if key < root.key:
+            root.left = self._remove(root.left, key)
+        elif key > root.key:
+            root.right = self._remove(root.right, key)
+        else:
+            self._size -= 1
+            return self._merge(root.left, root.right)
+        root.update()
+        return root
+
+    def _merge(self, left: _Node | None, right: _Node | None) -> _Node | None:
+        if left is None or right is None:
+            return left or right
+        if left.priority > right.priority:
+            left.right = self._merge(left.right, right)
+            left.update()
+            return left
+        right.left = self._merge(left, right.left)
+        right.update()
+        return right
+
+    @staticmethod
+    def _rotate_right(node: _Node) -> _Node:
+        pivot = node.left
+        node.left, pivot.right = pivot.right, node
+        node.update()
+        pivot.update()
+        return pivot
+
+    @staticmethod
+    def _rotate_left(node: _Node) -> _Node:
+        pivot = node.right
+        node.right, pivot.left = pivot.left, node
+        node.update()
+        pivot.update()
+        return pivot
+
+
+class ConflictError(ValueError):
+    def __init__(self, conflicts: list[Event]):
+        super().__init__("Overlaps " + ", ".join(event.title for event in conflicts))
+        self.conflicts = conflicts
+
+
+class Calendar:
+    """One calendar's events, indexed for overlap, free-time and conflict queries."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._events: dict[str, Event] = {}
+        self._tree = IntervalTree()
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __iter__(self) -> Iterator[Event]:
+        return iter(self._tree)
+
+    def get(self, event_id: str) -> Event | None:
+        return self._events.get(event_id)
+
+    def add(
+        self,
+        title: str,
+        start: datetime,
+        end: datetime,
+        attendees: tuple[str, ...] = (),
+        event_id: str | None = None,
+        allow_conflicts: bool = True,
+    ) -> Event:
+        """Adds an event; raises ConflictError if it overlaps another and allow_conflicts is off."""
+        if end <= start:
+            raise ValueError("An event must end after it starts")
+        if event_id is None:
+            # Skip ids taken by loaded events.
+            while f"evt-{self._next_id}" in self._events:
+                self._next_id += 1
+            event_id = f"evt-{self._next_id}"
+            self._next_id += 1
+        if event_id in self._events:
+            raise ValueError(f"Event {event_id} already exists")
+        if not allow_conflicts:
+            conflicts = self.overlapping(start, end)
+            if conflicts:
+                raise ConflictError(conflicts)
+        event = Event(event_id, title, start, end, tuple(attendees))
+        self._events[event_id] = event
+        self._tree.insert(event)
+        return event
+
+    def load(self, events: Iterable[dict]) -> int:
+        """Adds events given as in Event.as_dict, conflicts included, and returns how many.
+
+        An event without an id gets a new one.
+        """
+        count = 0
+        for data in events:
+            self.add(
+                data.get("title", "Meeting"),
+                parse_time(data["start"]),
+                parse_time(data["end"]),
+                attendees=tuple(data.get("attendees", ())),
+                event_id=data.get("id"),
+            )
+            count += 1
+        return count
+
+    def remove(self, event_id: str) -> Event:
+        event = self._events.pop(event_id, None)
+        if event is None:
+            raise KeyError(f"Event {event_id} not found")
+        self._tree.remove(event)
+        return event
+
+    def overlapping(self, start: datetime, end: datetime) -> list[Event]:
+        return self._tree.overlapping(start, end)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return not self._tree.overlapping(start, end)
+
+    def free_slots(
+        self, start: datetime, end: datetime, min_duration: timedelta = timedelta(0)
+    ) -> list[tuple[datetime, datetime]]:
+        """The gaps in [start, end) not covered by any event, at least min_duration long."""
+        slots = []
+        cursor = start
+        for event in self._tree.overlapping(start, end):
+            if event.start > cursor and event.start - cursor >= min_duration:
+                slots.append((cursor, event.start))
+            cursor = max(cursor, event.end)
+        if end > cursor and end - cursor >= min_duration:
+            slots.append((cursor, end))
+        return slots
+
+    def next_free(
+        self,
+        after: datetime,
+        duration: timedelta,
+        until: datetime | None = None,
+        ignore: str | None = None,
+    ) -> datetime | None:
+        """The earliest start at or after `after` with `duration` free, ending by `until`."""
+        start = after
+        while until is None or start + duration <= until:
+            blocking = [
+                event for event in self._tree.overlapping(start, start + duration) if event.id != ignore
+            ]
+            if not blocking:
+                return start
+            start = max(event.end for event in blocking)
+        return None
+
+    def next_free_within(
+        self,
+        after: datetime,
+        duration: timedelta,
+        hours: tuple[time, time],
+        weekdays: Collection[int] = range(7),
+        ignore: str | None = None,
+        max_days: int = 366,
+    ) -> datetime | None:
+        """Like next_free, but the slot must fall within `hours` on one of `weekdays` (0 is Monday).
+
+        Looks at most max_days days ahead.
+        """
+        opens, closes = hours
+        day = after.date()
+        for _ in range(max_days):
+            if day.weekday() in weekdays:
+                start = max(after, datetime.combine(day, opens))
+                found = self.next_free(start, duration, until=datetime.combine(day, closes), ignore=ignore)
+                if found is not None:
+                    return found
+            day += timedelta(days=1)
+        return None
+
+    def conflicts(
+        self, start: datetime | None = None, end: datetime | None = None
+    ) -> list[tuple[Event, Event]]:
+        """Every pair of overlapping events, optionally only among those overlapping [start, end).
+
+        A sweep over events in start order, keeping the ones still running in
+        a heap by end time: O(n log n) plus one step per conflicting pair.
+        """
+        if start is None and end is None:
+            events: list[Event] | Iterator[Event] = iter(self._tree)
+        else:
+            events = self._tree.overlapping(start or datetime.min, end or datetime.max)
+        pairs = []
+        running: list[tuple[datetime, str, Event]] = []
+        for event in events:
+            while running and running[0][0] <= event.start:
+                heapq.heappop(running)
+            pairs.extend((other, event) for _, _, other in running)
+            heapq.heappush(running, (event.end, event.id, event))
+        return pairs
+
+
+class CalendarEngine:
+    """The calendars the agent manages, by name."""
+
+    def __init__(self):
+        self._calendars: dict[str, Calendar] = {}
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> "CalendarEngine":
+        """Loads a JSON object mapping calendar names to lists of events, as in Event.as_dict."""
+        engine = cls()
+        engine.load(json.loads(Path(path).read_text(encoding="utf-8")))
+        return engine
+
+    def load(self, calendars: dict[str, list[dict]]):
+        for name, events in calendars.items():
+            self.calendar(name).load(events)
+
+    def calendar(self, name: str) -> Calendar:
+        if name not in self._calendars:
+            self._calendars[name] = Calendar(name)
+        return self._calendars[name]
+
+    def names(self) -> list[str]:
+        return sorted(self._calendars)
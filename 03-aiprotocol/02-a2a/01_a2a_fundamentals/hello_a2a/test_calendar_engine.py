@@ -0,0 +1,94 @@
+import random
+from datetime import datetime, time, timedelta
+
+from calendar_engine import Calendar, CalendarEngine, Event, IntervalTree
+
+BASE = datetime(2025, 6, 2)  # a Monday
+
+
+def at(hours: float) -> datetime:
+    return BASE + timedelta(hours=hours)
+
+
+def random_events(rng: random.Random, count: int) -> list[Event]:
+    events = []
+    for number in range(count):
+        start = at(rng.randrange(0, 24 * 14 * 4) / 4)
+        events.append(Event(f"e{number}", "Event", start, start + timedelta(minutes=rng.choice([15, 30, 60, 180]))))
+    return events
+
+
+def test_overlapping_matches_a_linear_scan():
+    rng = random.Random(25)
+    tree = IntervalTree()
+    events = random_events(rng, 500)
+    for event in events:
+        tree.insert(event)
+    for event in events[::3]:
+        assert tree.remove(event)
+    live = [event for index, event in enumerate(events) if index % 3]
+    assert len(tree) == len(live)
+
+    for _ in range(300):
+        start = at(rng.randrange(0, 24 * 14 * 4) / 4)
+        end = start + timedelta(minutes=rng.choice([1, 30, 240]))
+        expected = sorted(
+            (event for event in live if event.start < end and event.end > start),
+            key=lambda event: (event.start, event.end, event.id),
+        )
+        assert tree.overlapping(start, end) == expected
+
+
+def test_touching_events_do_not_overlap():
+    tree = IntervalTree()
+    event = Event("a", "A", at(9), at(10))
+    tree.insert(event)
+    assert tree.overlapping(at(10), at(11)) == []
+    assert tree.overlapping(at(8), at(9)) == []
+    assert tree.overlapping(at(9.5), at(9.6)) == [event]
+    assert not tree.remove(Event("b", "B", at(9), at(10)))
+
+
+def test_free_slots_and_next_free():
+    calendar = Calendar("primary")
+    calendar.add("Standup", at(9), at(9.5))
+    calendar.add("Review", at(10), at(12))
+    calendar.add("Overlap", at(11), at(13))
+    assert calendar.free_slots(at(9), at(17), timedelta(hours=1)) == [(at(13), at(17))]
+    assert calendar.next_free(at(9), timedelta(minutes=30)) == at(9.5)
+    assert calendar.next_free(at(9), timedelta(hours=1)) == at(13)
+    assert calendar.next_free(at(9), timedelta(hours=1), until=at(12)) is None
+
+
+def test_next_free_within_stays_in_working_hours():
+    calendar = Calendar("primary")
+    calendar.add("Late", at(24 * 4 + 16), at(24 * 4 + 17))  # Friday 16:00-17:00
+    hours = (time(9), time(17))
+    # Nothing fits on Friday after 16:00, and the weekend is skipped.
+    found = calendar.next_free_within(at(24 * 4 + 16), timedelta(hours=1), hours, weekdays=range(5))
+    assert found == at(24 * 7 + 9)
+    assert calendar.next_free_within(at(2), timedelta(hours=1), hours) == at(9)
+    assert calendar.next_free_within(at(9), timedelta(hours=9), hours) is None
+
+
+def test_conflicts_lists_every_overlapping_pair():
+    calendar = Calendar("primary")
+    a = calendar.add("A", at(9), at(12))
+    b = calendar.add("B", at(10), at(11))
+    c = calendar.add("C", at(10.5), at(13))
+    calendar.add("D", at(13), at(14))
+    assert set(calendar.conflicts()) == {(a, b), (a, c), (b, c)}
+    assert calendar.conflicts(at(12), at(24)) == []
+
+
+def test_engine_loads_existing_events():
+    engine = CalendarEngine()
+    engine.load({"primary": [
+        {"id": "evt-1", "title": "Standup", "start": "2025-06-02T09:00", "end": "2025-06-02T09:15"},
+        {"title": "Clash", "start": "2025-06-02T09:10", "end": "2025-06-02T09:30", "attendees": ["ana@example.com"]},
+    ]})
+    calendar = engine.calendar("primary")
+    assert [event.id for event in calendar] == ["evt-1", "evt-2"]
+    assert calendar.get("evt-2").attendees == ("ana@example.com",)
+    assert len(calendar.conflicts()) == 1
+    assert calendar.add("New", at(15), at(16)).id == "evt-3"